@@ -34,9 +34,11 @@ setup_kwargs = dict(
             "workshop = eduk8s.cli.workshop",
             "session = eduk8s.cli.session",
             "install = eduk8s.cli.install",
+            "batch = eduk8s.cli.batch",
         ],
     },
     install_requires=[
+        "aiohttp>=3.7",
         "click",
         "requests",
         "rstr",
@@ -0,0 +1,480 @@
+from .kube import quantity
+
+resource_budgets = {
+    "small": {
+        "resource-limits": {
+            "kind": "LimitRange",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "resource-limits",
+                "annotations": {"resource-budget": "small"},
+            },
+            "spec": {
+                "limits": [
+                    {
+                        "type": "Pod",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "1", "memory": "1Gi"},
+                    },
+                    {
+                        "type": "Container",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "1", "memory": "1Gi"},
+                        "default": {"cpu": "250m", "memory": "256Mi"},
+                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
+                    },
+                    {
+                        "type": "PersistentVolumeClaim",
+                        "min": {"storage": "1Gi"},
+                        "max": {"storage": "1Gi"},
+                    },
+                ]
+            },
+        },
+        "compute-resources": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources",
+                "annotations": {"resource-budget": "small"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "1", "limits.memory": "1Gi"},
+                "scopes": ["NotTerminating"],
+            },
+        },
+        "compute-resources-timebound": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources-timebound",
+                "annotations": {"resource-budget": "small"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "1", "limits.memory": "1Gi"},
+                "scopes": ["Terminating"],
+            },
+        },
+        "object-counts": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "object-counts",
+                "annotations": {"resource-budget": "small"},
+            },
+            "spec": {
+                "hard": {
+                    "persistentvolumeclaims": "3",
+                    "replicationcontrollers": "10",
+                    "secrets": "20",
+                    "services": "5",
+                }
+            },
+        },
+    },
+    "medium": {
+        "resource-limits": {
+            "kind": "LimitRange",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "resource-limits",
+                "annotations": {"resource-budget": "medium"},
+            },
+            "spec": {
+                "limits": [
+                    {
+                        "type": "Pod",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "2", "memory": "2Gi"},
+                    },
+                    {
+                        "type": "Container",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "2", "memory": "2Gi"},
+                        "default": {"cpu": "500m", "memory": "512Mi"},
+                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
+                    },
+                    {
+                        "type": "PersistentVolumeClaim",
+                        "min": {"storage": "1Gi"},
+                        "max": {"storage": "5Gi"},
+                    },
+                ]
+            },
+        },
+        "compute-resources": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources",
+                "annotations": {"resource-budget": "medium"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "2", "limits.memory": "2Gi"},
+                "scopes": ["NotTerminating"],
+            },
+        },
+        "compute-resources-timebound": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources-timebound",
+                "annotations": {"resource-budget": "medium"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "2", "limits.memory": "2Gi"},
+                "scopes": ["Terminating"],
+            },
+        },
+        "object-counts": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "object-counts",
+                "annotations": {"resource-budget": "medium"},
+            },
+            "spec": {
+                "hard": {
+                    "persistentvolumeclaims": "6",
+                    "replicationcontrollers": "15",
+                    "secrets": "25",
+                    "services": "10",
+                }
+            },
+        },
+    },
+    "large": {
+        "resource-limits": {
+            "kind": "LimitRange",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "resource-limits",
+                "annotations": {"resource-budget": "large"},
+            },
+            "spec": {
+                "limits": [
+                    {
+                        "type": "Pod",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "4", "memory": "4Gi"},
+                    },
+                    {
+                        "type": "Container",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "4", "memory": "4Gi"},
+                        "default": {"cpu": "500m", "memory": "1Gi"},
+                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
+                    },
+                    {
+                        "type": "PersistentVolumeClaim",
+                        "min": {"storage": "1Gi"},
+                        "max": {"storage": "10Gi"},
+                    },
+                ]
+            },
+        },
+        "compute-resources": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources",
+                "annotations": {"resource-budget": "large"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "4", "limits.memory": "4Gi"},
+                "scopes": ["NotTerminating"],
+            },
+        },
+        "compute-resources-timebound": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources-timebound",
+                "annotations": {"resource-budget": "large"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "4", "limits.memory": "4Gi"},
+                "scopes": ["Terminating"],
+            },
+        },
+        "object-counts": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "object-counts",
+                "annotations": {"resource-budget": "large"},
+            },
+            "spec": {
+                "hard": {
+                    "persistentvolumeclaims": "12",
+                    "replicationcontrollers": "25",
+                    "secrets": "35",
+                    "services": "20",
+                }
+            },
+        },
+    },
+    "x-large": {
+        "resource-limits": {
+            "kind": "LimitRange",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "resource-limits",
+                "annotations": {"resource-budget": "x-large"},
+            },
+            "spec": {
+                "limits": [
+                    {
+                        "type": "Pod",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "8", "memory": "8Gi"},
+                    },
+                    {
+                        "type": "Container",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "8", "memory": "8Gi"},
+                        "default": {"cpu": "500m", "memory": "2Gi"},
+                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
+                    },
+                    {
+                        "type": "PersistentVolumeClaim",
+                        "min": {"storage": "1Gi"},
+                        "max": {"storage": "20Gi"},
+                    },
+                ]
+            },
+        },
+        "compute-resources": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources",
+                "annotations": {"resource-budget": "x-large"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "8", "limits.memory": "8Gi"},
+                "scopes": ["NotTerminating"],
+            },
+        },
+        "compute-resources-timebound": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources-timebound",
+                "annotations": {"resource-budget": "x-large"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "8", "limits.memory": "8Gi"},
+                "scopes": ["Terminating"],
+            },
+        },
+        "object-counts": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "object-counts",
+                "annotations": {"resource-budget": "x-large"},
+            },
+            "spec": {
+                "hard": {
+                    "persistentvolumeclaims": "18",
+                    "replicationcontrollers": "35",
+                    "secrets": "45",
+                    "services": "30",
+                }
+            },
+        },
+    },
+    "xx-large": {
+        "resource-limits": {
+            "kind": "LimitRange",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "resource-limits",
+                "annotations": {"resource-budget": "xx-large"},
+            },
+            "spec": {
+                "limits": [
+                    {
+                        "type": "Pod",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "12", "memory": "12Gi"},
+                    },
+                    {
+                        "type": "Container",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "12", "memory": "12Gi"},
+                        "default": {"cpu": "500m", "memory": "2Gi"},
+                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
+                    },
+                    {
+                        "type": "PersistentVolumeClaim",
+                        "min": {"storage": "1Gi"},
+                        "max": {"storage": "20Gi"},
+                    },
+                ]
+            },
+        },
+        "compute-resources": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources",
+                "annotations": {"resource-budget": "xx-large"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "12", "limits.memory": "12Gi"},
+                "scopes": ["NotTerminating"],
+            },
+        },
+        "compute-resources-timebound": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources-timebound",
+                "annotations": {"resource-budget": "xx-large"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "12", "limits.memory": "12Gi"},
+                "scopes": ["Terminating"],
+            },
+        },
+        "object-counts": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "object-counts",
+                "annotations": {"resource-budget": "xx-large"},
+            },
+            "spec": {
+                "hard": {
+                    "persistentvolumeclaims": "24",
+                    "replicationcontrollers": "45",
+                    "secrets": "55",
+                    "services": "40",
+                }
+            },
+        },
+    },
+    "xxx-large": {
+        "resource-limits": {
+            "kind": "LimitRange",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "resource-limits",
+                "annotations": {"resource-budget": "xxx-large"},
+            },
+            "spec": {
+                "limits": [
+                    {
+                        "type": "Pod",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "16", "memory": "16Gi"},
+                    },
+                    {
+                        "type": "Container",
+                        "min": {"cpu": "50m", "memory": "32Mi"},
+                        "max": {"cpu": "16", "memory": "16Gi"},
+                        "default": {"cpu": "500m", "memory": "2Gi"},
+                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
+                    },
+                    {
+                        "type": "PersistentVolumeClaim",
+                        "min": {"storage": "1Gi"},
+                        "max": {"storage": "20Gi"},
+                    },
+                ]
+            },
+        },
+        "compute-resources": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources",
+                "annotations": {"resource-budget": "xxx-large"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "16", "limits.memory": "16Gi"},
+                "scopes": ["NotTerminating"],
+            },
+        },
+        "compute-resources-timebound": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "compute-resources-timebound",
+                "annotations": {"resource-budget": "xxx-large"},
+            },
+            "spec": {
+                "hard": {"limits.cpu": "16", "limits.memory": "16Gi"},
+                "scopes": ["Terminating"],
+            },
+        },
+        "object-counts": {
+            "kind": "ResourceQuota",
+            "apiVersion": "v1",
+            "metadata": {
+                "name": "object-counts",
+                "annotations": {"resource-budget": "xxx-large"},
+            },
+            "spec": {
+                "hard": {
+                    "persistentvolumeclaims": "30",
+                    "replicationcontrollers": "55",
+                    "secrets": "65",
+                    "services": "50",
+                }
+            },
+        },
+    },
+}
+
+
+# Sessions with the default budget, no budget, or a budget which isn't
+# known, have no quotas applied to their namespace, but still use
+# resources. They are charged what the smallest budget would allow.
+
+default_budget = "small"
+
+
+def charged_budget(budget):
+    # The budget a session is charged for against the capacity of the
+    # cluster, when admitting sessions and when reporting what sessions
+    # have reserved, so the two always agree.
+
+    if budget == "unlimited" or resource_budgets.get(budget):
+        return budget
+
+    return default_budget
+
+
+def budget_limits(budget):
+    # The resources committed to a session are the limits of the quota
+    # for the budget it is charged for. Only sessions with an unlimited
+    # budget are taken not to commit anything, there being no way to know
+    # what they use.
+
+    budget = charged_budget(budget)
+
+    if budget == "unlimited":
+        return (0, 0)
+
+    hard = resource_budgets[budget]["compute-resources"]["spec"]["hard"]
+
+    return (
+        quantity.parse_quantity(hard["limits.cpu"]),
+        quantity.parse_quantity(hard["limits.memory"]),
+    )
+
+
+def committed_resources(session_budgets):
+    # Total the resources committed to sessions with the given budgets.
+
+    cpu, memory = 0, 0
+
+    for budget in session_budgets:
+        limits = budget_limits(budget)
+        cpu += limits[0]
+        memory += limits[1]
+
+    return cpu, memory
@@ -1,11 +1,58 @@
+import time
+
 import click
 
+from .. import kube
+from .. import metrics
+from .. import profiling
+
 ENTRYPOINTS = "eduk8s_cli_plugins"
 
 
-@click.group()
+class _RootGroup(click.Group):
+    # Records the arguments for the command before they are consumed, so
+    # the name of the command being run can be found from them, and then
+    # whether the command succeeded. Both are recorded before the context
+    # is closed, so are known when the metrics are written.
+
+    def invoke(self, ctx):
+        ctx.meta["eduk8s.args"] = list(ctx.protected_args) + list(ctx.args)
+        ctx.meta["eduk8s.outcome"] = "failure"
+
+        try:
+            result = super().invoke(ctx)
+        except click.exceptions.Exit as e:
+            if e.exit_code == 0:
+                ctx.meta["eduk8s.outcome"] = "success"
+            raise
+
+        ctx.meta["eduk8s.outcome"] = "success"
+
+        return result
+
+
+@click.group(cls=_RootGroup)
 @click.pass_context
-def root(ctx):
+@click.option(
+    "-v", "--verbose", is_flag=True, help="Report on requests made to the cluster.",
+)
+@click.option(
+    "--profile-cpu",
+    default=None,
+    metavar="FILE",
+    help="Write a CPU profile of the command, as pstats or collapsed stacks.",
+)
+@click.option(
+    "--profile-mem", is_flag=True, help="Report peak memory and top allocations.",
+)
+@click.option(
+    "--metrics-file",
+    default=None,
+    metavar="FILE",
+    envvar="EDUK8S_METRICS_FILE",
+    help="Write OpenMetrics text file of metrics for the command when done.",
+)
+def root(ctx, verbose, profile_cpu, profile_mem, metrics_file):
     """
     Command line client for eduk8s.
 
@@ -15,6 +62,89 @@ def root(ctx):
 
     """
 
+    ctx.ensure_object(dict)
+    ctx.obj["verbose"] = verbose
+
+    if verbose:
+        ctx.call_on_close(_report_requests)
+
+    # Profiling is stopped when the context for the command is closed,
+    # after the subcommand has run.
+
+    if profile_cpu:
+        ctx.call_on_close(profiling.profile_cpu(profile_cpu))
+
+    if profile_mem:
+        ctx.call_on_close(_report_memory(profiling.profile_memory()))
+
+    if metrics_file:
+        ctx.call_on_close(_write_metrics(ctx, metrics_file))
+
+
+def _report_requests():
+    totals = kube.counters()
+
+    click.echo(
+        f"Requests: {totals['requests']}, retries: {totals['retries']}, "
+        f"throttled: {totals['throttled']}, received: {totals['received']} bytes "
+        f"({totals['decoded']} bytes decoded)",
+        err=True,
+    )
+
+
+def _report_memory(stop):
+    def _report():
+        for line in stop():
+            click.echo(line, err=True)
+
+    return _report
+
+
+def _command_name(ctx):
+    # The name of the command being run, less any arguments, found by
+    # following the command groups down from the root.
+
+    args = list(ctx.meta.get("eduk8s.args", []))
+
+    command = ctx.command
+    names = []
+
+    while isinstance(command, click.MultiCommand) and args:
+        command = command.get_command(ctx, args.pop(0))
+        if command is None:
+            break
+        names.append(command.name)
+
+    return " ".join(names)
+
+
+def _write_metrics(ctx, filename):
+    started = time.monotonic()
+
+    def _write():
+        command = _command_name(ctx)
+
+        outcome = ctx.meta.get("eduk8s.outcome", "failure")
+
+        labels = {"command": command, "outcome": outcome}
+
+        metrics.observe(
+            "eduk8s_command_duration_seconds", time.monotonic() - started, labels
+        )
+        metrics.set_value("eduk8s_command_timestamp_seconds", int(time.time()), labels)
+
+        totals = kube.counters()
+
+        for field in ("requests", "retries", "throttled", "failures"):
+            metrics.set_value(f"eduk8s_api_{field}", totals[field])
+
+        try:
+            metrics.write_textfile(filename)
+        except OSError as e:
+            click.echo(f"Error: Failed to write metrics to {filename}: {e}", err=True)
+
+    return _write
+
 
 def main():
     # Import any plugins for extending the available commands. They
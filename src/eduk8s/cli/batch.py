@@ -0,0 +1,277 @@
+import io
+import sys
+import json
+import time
+import shlex
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import yaml
+
+import click
+
+from ..cli import root
+
+
+class _ThreadOutput(io.TextIOBase):
+    # Stands in for stdout or stderr while operations are run, sending
+    # what is written by each thread running an operation to the buffer
+    # for that operation, and anything else to the original stream.
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    @property
+    def encoding(self):
+        return getattr(self.stream, "encoding", "utf-8")
+
+    @property
+    def errors(self):
+        return getattr(self.stream, "errors", "strict")
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        if getattr(self.local, "buffer", None) is None:
+            self.stream.flush()
+
+
+def _load_operations(ctx, file):
+    # Operations are given as a YAML list, or a dict with the list under
+    # "operations". They can instead be given as JSON with one operation
+    # per line, so they can be piped in from a script.
+
+    text = file.read()
+
+    try:
+        if text.lstrip().startswith("{"):
+            try:
+                operations = [
+                    json.loads(line) for line in text.splitlines() if line.strip()
+                ]
+            except ValueError:
+                operations = yaml.safe_load(text)
+        else:
+            operations = yaml.safe_load(text) or []
+    except yaml.YAMLError as e:
+        ctx.fail(f"Invalid operations: {e}")
+
+    if isinstance(operations, dict):
+        operations = operations.get("operations") or []
+
+    if not isinstance(operations, list):
+        ctx.fail("Operations must be a list.")
+
+    # Each operation depends on the one before, unless it says what it
+    # depends on, so a plain list is run in sequence the same as it would
+    # be from a shell script.
+
+    steps = {}
+    previous = None
+
+    for number, operation in enumerate(operations, 1):
+        if not isinstance(operation, dict) or not operation.get("command"):
+            ctx.fail(f"Operation {number} has no command.")
+
+        step_id = str(operation.get("id", number))
+
+        if step_id in steps:
+            ctx.fail(f"Operation '{step_id}' is given more than once.")
+
+        command = operation["command"]
+
+        if isinstance(command, str):
+            command = shlex.split(command)
+        else:
+            command = [str(argument) for argument in command]
+
+        if command[:1] == ["eduk8s"]:
+            command = command[1:]
+
+        if command[:1] == ["batch"]:
+            ctx.fail(f"Operation '{step_id}' cannot run a batch.")
+
+        after = operation.get("after")
+
+        if after is None:
+            after = [] if previous is None else [previous]
+        elif isinstance(after, (str, int)):
+            after = [str(after)]
+        else:
+            after = [str(name) for name in after]
+
+        steps[step_id] = {"command": command, "after": after}
+
+        previous = step_id
+
+    for step_id, step in steps.items():
+        for name in step["after"]:
+            if name not in steps:
+                ctx.fail(f"Operation '{step_id}' depends on unknown '{name}'.")
+
+    # Check the operations can all be run, which they can't be if any of
+    # them depend on each other.
+
+    done = set()
+
+    while len(done) < len(steps):
+        ready = [
+            step_id
+            for step_id, step in steps.items()
+            if step_id not in done and done.issuperset(step["after"])
+        ]
+
+        if not ready:
+            remaining = ", ".join(sorted(set(steps) - done))
+            ctx.fail(f"Operations depend on each other: {remaining}")
+
+        done.update(ready)
+
+    return steps
+
+
+def _run_operation(stdout, stderr, command):
+    # Run the command for an operation the same as it would be from the
+    # command line, capturing what it outputs. Commands report failure
+    # by raising click exceptions, or exiting with a status.
+
+    buffer = io.StringIO()
+
+    stdout.local.buffer = buffer
+    stderr.local.buffer = buffer
+
+    started = time.monotonic()
+
+    try:
+        result = root.main(
+            args=command, prog_name="eduk8s", standalone_mode=False, obj={}
+        )
+        exit_code = result if isinstance(result, int) else 0
+        error = None
+    except click.ClickException as e:
+        exit_code = e.exit_code
+        error = e.format_message()
+    except click.exceptions.Abort:
+        exit_code = 1
+        error = "Aborted!"
+    except Exception as e:
+        exit_code = 1
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        stdout.local.buffer = None
+        stderr.local.buffer = None
+
+    return {
+        "status": "ok" if exit_code == 0 else "failed",
+        "exit_code": exit_code,
+        "output": buffer.getvalue(),
+        "error": error,
+        "duration": round(time.monotonic() - started, 3),
+    }
+
+
+def _report(output, step_id, command, result):
+    if output == "json":
+        record = dict(id=step_id, command=command, **result)
+        click.echo(json.dumps(record))
+        return
+
+    for line in result["output"].splitlines():
+        click.echo(f"[{step_id}] {line}")
+
+    if result["status"] == "skipped":
+        click.echo(f"[{step_id}] Skipped: {result['error']}", err=True)
+    elif result["error"]:
+        click.echo(f"[{step_id}] Error: {result['error']}", err=True)
+
+
+@root.command("batch")
+@click.pass_context
+@click.option(
+    "-f",
+    "--filename",
+    "file",
+    type=click.File("r"),
+    required=True,
+    help="File of operations to run, or - to read them from stdin.",
+)
+@click.option(
+    "-j", "--jobs", default=8, help="Maximum number of operations run at once.",
+)
+@click.option(
+    "-o",
+    "--output",
+    default="text",
+    type=click.Choice(["text", "json"]),
+    help="Output format for results of operations.",
+)
+def command_batch(ctx, file, jobs, output):
+    """
+    Run a set of workshop and session operations.
+    """
+
+    steps = _load_operations(ctx, file)
+
+    # All operations are run in this process, so they share the clients
+    # for the cluster and what was found by API discovery. Operations run
+    # as soon as those they depend on have succeeded, and the result of
+    # each is output as soon as it is done.
+
+    stdout = _ThreadOutput(sys.stdout)
+    stderr = _ThreadOutput(sys.stderr)
+
+    results = {}
+    running = {}
+
+    sys.stdout, sys.stderr = stdout, stderr
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+            while len(results) < len(steps):
+                for step_id, step in steps.items():
+                    if step_id in results or step_id in running.values():
+                        continue
+
+                    failed = [
+                        name
+                        for name in step["after"]
+                        if name in results and results[name]["status"] != "ok"
+                    ]
+
+                    if failed:
+                        results[step_id] = {
+                            "status": "skipped",
+                            "exit_code": None,
+                            "output": "",
+                            "error": f"Depends on failed '{failed[0]}'.",
+                            "duration": 0,
+                        }
+                        _report(output, step_id, step["command"], results[step_id])
+
+                    elif all(name in results for name in step["after"]):
+                        future = executor.submit(
+                            _run_operation, stdout, stderr, step["command"]
+                        )
+                        running[future] = step_id
+
+                if not running:
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    step_id = running.pop(future)
+                    results[step_id] = future.result()
+                    _report(
+                        output, step_id, steps[step_id]["command"], results[step_id]
+                    )
+
+    finally:
+        sys.stdout, sys.stderr = stdout.stream, stderr.stream
+
+    if any(result["status"] != "ok" for result in results.values()):
+        ctx.exit(1)
@@ -1,5 +1,12 @@
+import json
+import time
 import random
 import string
+import threading
+
+from decimal import Decimal
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 
 import yaml
 
@@ -8,10 +15,16 @@ import requests
 
 from kubernetes.client.rest import ApiException
 from openshift.dynamic.exceptions import ResourceNotFoundError
-from openshift.dynamic import Resource, ResourceField, ResourceInstance
+from openshift.dynamic import Resource, ResourceInstance
 
 from ..cli import root
+from .. import budgets
+from .. import images
 from .. import kube
+from .. import metrics
+from .. import rbac
+from .. import teardown
+from ..kube import aio, merge, quantity
 
 
 def _format_as_columns(columns, data):
@@ -38,1126 +51,2526 @@ def _resource_item(resource, path, default):
     return item
 
 
-@root.group("session")
-@click.pass_context
-def group_session(ctx):
-    """
-    Deploy workshops and manage sessions.
-    """
+def _parse_duration(value):
+    value = str(value or "0").strip()
 
-    pass
+    if value[-1:] in ("s", "m", "h"):
+        multiplier = {"s": 1, "m": 60, "h": 3600}[value[-1]]
+        value = value[:-1]
+    else:
+        multiplier = 1
 
+    try:
+        return int(value) * multiplier
+    except ValueError:
+        return 0
 
-@group_session.command("list")
-@click.pass_context
-def command_session_list(ctx):
-    """
-    List active workshop sessions.
-    """
 
-    client = kube.client()
+def _parse_timestamp(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
 
-    session_resource = _resource_type(
-        ctx, client, "training.eduk8s.io/v1alpha1", "Session"
-    )
 
-    results = session_resource.get()
+def _format_timestamp(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    cols = [["NAME", "IMAGE", "URL"]]
-    data = []
 
-    for result in results.items:
-        data.append((result.metadata.name, result.spec.image, result.spec.url))
+def _fan_out(function, items, workers=16):
+    # Run the function against each item concurrently, returning a list
+    # of (item, result, exception) tuples in the original order.
 
-    if data:
-        click.echo("\n".join(_format_as_columns(cols, data)))
-    else:
-        click.echo("No active workshop sessions found.")
+    def _call(item):
+        try:
+            return (item, function(item), None)
+        except Exception as e:
+            return (item, None, e)
 
+    items = list(items)
 
-_resource_budgets = {
-    "small": {
-        "resource-limits": {
-            "kind": "LimitRange",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "resource-limits",
-                "annotations": {"resource-budget": "small"},
-            },
-            "spec": {
-                "limits": [
-                    {
-                        "type": "Pod",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "1", "memory": "1Gi"},
-                    },
-                    {
-                        "type": "Container",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "1", "memory": "1Gi"},
-                        "default": {"cpu": "250m", "memory": "256Mi"},
-                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
-                    },
-                    {
-                        "type": "PersistentVolumeClaim",
-                        "min": {"storage": "1Gi"},
-                        "max": {"storage": "1Gi"},
-                    },
-                ]
-            },
-        },
-        "compute-resources": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources",
-                "annotations": {"resource-budget": "small"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "1", "limits.memory": "1Gi"},
-                "scopes": ["NotTerminating"],
-            },
-        },
-        "compute-resources-timebound": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources-timebound",
-                "annotations": {"resource-budget": "small"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "1", "limits.memory": "1Gi"},
-                "scopes": ["Terminating"],
-            },
-        },
-        "object-counts": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "object-counts",
-                "annotations": {"resource-budget": "small"},
-            },
-            "spec": {
-                "hard": {
-                    "persistentvolumeclaims": "3",
-                    "replicationcontrollers": "10",
-                    "secrets": "20",
-                    "services": "5",
-                }
-            },
-        },
-    },
-    "medium": {
-        "resource-limits": {
-            "kind": "LimitRange",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "resource-limits",
-                "annotations": {"resource-budget": "medium"},
-            },
-            "spec": {
-                "limits": [
-                    {
-                        "type": "Pod",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "2", "memory": "2Gi"},
-                    },
-                    {
-                        "type": "Container",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "2", "memory": "2Gi"},
-                        "default": {"cpu": "500m", "memory": "512Mi"},
-                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
-                    },
-                    {
-                        "type": "PersistentVolumeClaim",
-                        "min": {"storage": "1Gi"},
-                        "max": {"storage": "5Gi"},
-                    },
-                ]
-            },
-        },
-        "compute-resources": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources",
-                "annotations": {"resource-budget": "medium"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "2", "limits.memory": "2Gi"},
-                "scopes": ["NotTerminating"],
-            },
-        },
-        "compute-resources-timebound": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources-timebound",
-                "annotations": {"resource-budget": "medium"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "2", "limits.memory": "2Gi"},
-                "scopes": ["Terminating"],
-            },
-        },
-        "object-counts": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "object-counts",
-                "annotations": {"resource-budget": "medium"},
-            },
-            "spec": {
-                "hard": {
-                    "persistentvolumeclaims": "6",
-                    "replicationcontrollers": "15",
-                    "secrets": "25",
-                    "services": "10",
-                }
-            },
-        },
-    },
-    "large": {
-        "resource-limits": {
-            "kind": "LimitRange",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "resource-limits",
-                "annotations": {"resource-budget": "large"},
-            },
-            "spec": {
-                "limits": [
-                    {
-                        "type": "Pod",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "4", "memory": "4Gi"},
-                    },
-                    {
-                        "type": "Container",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "4", "memory": "4Gi"},
-                        "default": {"cpu": "500m", "memory": "1Gi"},
-                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
-                    },
-                    {
-                        "type": "PersistentVolumeClaim",
-                        "min": {"storage": "1Gi"},
-                        "max": {"storage": "10Gi"},
-                    },
-                ]
-            },
-        },
-        "compute-resources": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources",
-                "annotations": {"resource-budget": "large"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "4", "limits.memory": "4Gi"},
-                "scopes": ["NotTerminating"],
-            },
-        },
-        "compute-resources-timebound": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources-timebound",
-                "annotations": {"resource-budget": "large"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "4", "limits.memory": "4Gi"},
-                "scopes": ["Terminating"],
-            },
-        },
-        "object-counts": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "object-counts",
-                "annotations": {"resource-budget": "large"},
-            },
-            "spec": {
-                "hard": {
-                    "persistentvolumeclaims": "12",
-                    "replicationcontrollers": "25",
-                    "secrets": "35",
-                    "services": "20",
-                }
-            },
-        },
-    },
-    "x-large": {
-        "resource-limits": {
-            "kind": "LimitRange",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "resource-limits",
-                "annotations": {"resource-budget": "x-large"},
-            },
-            "spec": {
-                "limits": [
-                    {
-                        "type": "Pod",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "8", "memory": "8Gi"},
-                    },
-                    {
-                        "type": "Container",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "8", "memory": "8Gi"},
-                        "default": {"cpu": "500m", "memory": "2Gi"},
-                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
-                    },
-                    {
-                        "type": "PersistentVolumeClaim",
-                        "min": {"storage": "1Gi"},
-                        "max": {"storage": "20Gi"},
-                    },
-                ]
-            },
-        },
-        "compute-resources": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources",
-                "annotations": {"resource-budget": "x-large"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "8", "limits.memory": "8Gi"},
-                "scopes": ["NotTerminating"],
-            },
-        },
-        "compute-resources-timebound": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources-timebound",
-                "annotations": {"resource-budget": "x-large"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "8", "limits.memory": "8Gi"},
-                "scopes": ["Terminating"],
-            },
-        },
-        "object-counts": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "object-counts",
-                "annotations": {"resource-budget": "x-large"},
-            },
-            "spec": {
-                "hard": {
-                    "persistentvolumeclaims": "18",
-                    "replicationcontrollers": "35",
-                    "secrets": "45",
-                    "services": "30",
-                }
-            },
-        },
-    },
-    "xx-large": {
-        "resource-limits": {
-            "kind": "LimitRange",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "resource-limits",
-                "annotations": {"resource-budget": "xx-large"},
-            },
-            "spec": {
-                "limits": [
-                    {
-                        "type": "Pod",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "12", "memory": "12Gi"},
-                    },
-                    {
-                        "type": "Container",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "12", "memory": "12Gi"},
-                        "default": {"cpu": "500m", "memory": "2Gi"},
-                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
-                    },
-                    {
-                        "type": "PersistentVolumeClaim",
-                        "min": {"storage": "1Gi"},
-                        "max": {"storage": "20Gi"},
-                    },
-                ]
-            },
-        },
-        "compute-resources": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources",
-                "annotations": {"resource-budget": "xx-large"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "12", "limits.memory": "12Gi"},
-                "scopes": ["NotTerminating"],
-            },
-        },
-        "compute-resources-timebound": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources-timebound",
-                "annotations": {"resource-budget": "xx-large"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "12", "limits.memory": "12Gi"},
-                "scopes": ["Terminating"],
-            },
-        },
-        "object-counts": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "object-counts",
-                "annotations": {"resource-budget": "xx-large"},
-            },
-            "spec": {
-                "hard": {
-                    "persistentvolumeclaims": "24",
-                    "replicationcontrollers": "45",
-                    "secrets": "55",
-                    "services": "40",
-                }
-            },
-        },
-    },
-    "xxx-large": {
-        "resource-limits": {
-            "kind": "LimitRange",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "resource-limits",
-                "annotations": {"resource-budget": "xxx-large"},
-            },
-            "spec": {
-                "limits": [
-                    {
-                        "type": "Pod",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "16", "memory": "16Gi"},
-                    },
-                    {
-                        "type": "Container",
-                        "min": {"cpu": "50m", "memory": "32Mi"},
-                        "max": {"cpu": "16", "memory": "16Gi"},
-                        "default": {"cpu": "500m", "memory": "2Gi"},
-                        "defaultRequest": {"cpu": "50m", "memory": "128Mi"},
-                    },
-                    {
-                        "type": "PersistentVolumeClaim",
-                        "min": {"storage": "1Gi"},
-                        "max": {"storage": "20Gi"},
-                    },
-                ]
-            },
-        },
-        "compute-resources": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources",
-                "annotations": {"resource-budget": "xxx-large"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "16", "limits.memory": "16Gi"},
-                "scopes": ["NotTerminating"],
-            },
-        },
-        "compute-resources-timebound": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "compute-resources-timebound",
-                "annotations": {"resource-budget": "xxx-large"},
-            },
-            "spec": {
-                "hard": {"limits.cpu": "16", "limits.memory": "16Gi"},
-                "scopes": ["Terminating"],
-            },
-        },
-        "object-counts": {
-            "kind": "ResourceQuota",
-            "apiVersion": "v1",
-            "metadata": {
-                "name": "object-counts",
-                "annotations": {"resource-budget": "xxx-large"},
-            },
-            "spec": {
-                "hard": {
-                    "persistentvolumeclaims": "30",
-                    "replicationcontrollers": "55",
-                    "secrets": "65",
-                    "services": "50",
-                }
-            },
-        },
-    },
-}
+    if not items:
+        return []
 
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as executor:
+        return list(executor.map(_call, items))
 
-def _setup_limits_and_quotas(
-    ctx, client, workshop_namespace, target_namespace, service_account, role, budget
+
+def _create_object(
+    created, resource, body, namespace=None, labels=None, exist_ok=False
 ):
-    limit_range_resource = _resource_type(ctx, client, "v1", "LimitRange")
-    resource_quota_resource = _resource_type(ctx, client, "v1", "ResourceQuota")
-    role_binding_resource = _resource_type(
-        ctx, client, "rbac.authorization.k8s.io/v1", "RoleBinding"
-    )
+    # Create the object, recording it against the list of objects created
+    # so far so that they can all be deleted if a later step fails. Any
+    # labels are added to those of the object, leaving the body as is.
+    # If allowed to already exist and it does, None is returned.
 
-    # Create role binding in the project so the users service account
-    # can create resources in it.
+    if labels:
+        metadata = body.get("metadata") or {}
+        metadata = dict(metadata, labels=dict(metadata.get("labels") or {}, **labels))
+        body = dict(body, metadata=metadata)
 
-    role_binding_body = {
-        "apiVersion": "rbac.authorization.k8s.io/v1",
-        "kind": "RoleBinding",
-        "metadata": {"name": "eduk8s"},
-        "roleRef": {
-            "apiGroup": "rbac.authorization.k8s.io",
-            "kind": "ClusterRole",
-            "name": f"{role}",
-        },
-        "subjects": [
-            {
-                "kind": "ServiceAccount",
-                "name": f"{service_account}",
-                "namespace": f"{workshop_namespace}",
-            }
-        ],
-    }
+    try:
+        instance = resource.create(namespace=namespace, body=body)
+    except ApiException as e:
+        if exist_ok and e.status == 409:
+            return None
+        raise
 
-    role_binding_resource.create(namespace=target_namespace, body=role_binding_body)
+    if created is not None:
+        created.append((resource, instance.metadata.namespace, instance.metadata.name))
 
-    # Determine what project namespace resources need to be used.
+    return instance
 
-    if budget != "unlimited":
-        if budget not in _resource_budgets:
-            budget = "default"
-        elif not _resource_budgets[budget]:
-            budget = "default"
 
-    if budget not in ("default", "unlimited"):
-        budget_item = _resource_budgets[budget]
+def _unbind_session(client, workshop_namespace, user_id):
+    # Remove the service account of a session from the bindings shared by
+    # sessions of the workshop, for console access and for access to the
+    # namespace shared by sessions. Where a binding doesn't exist, or
+    # doesn't list the service account, there is nothing to do.
 
-        resource_limits_definition = budget_item["resource-limits"]
-        compute_resources_definition = budget_item["compute-resources"]
-        compute_resources_timebound_definition = budget_item[
-            "compute-resources-timebound"
-        ]
-        object_counts_definition = budget_item["object-counts"]
+    cluster_role_binding_resource = client.resources.get(
+        api_version="rbac.authorization.k8s.io/v1", kind="ClusterRoleBinding"
+    )
+    role_binding_resource = client.resources.get(
+        api_version="rbac.authorization.k8s.io/v1", kind="RoleBinding"
+    )
 
-    # Delete any limit ranges applied to the project that may conflict
-    # with the limit range being applied. For the case of unlimited, we
-    # delete any being applied but don't replace it.
+    subject = rbac.session_subject(workshop_namespace, user_id)
 
-    if budget != "default":
-        limit_ranges = limit_range_resource.get(namespace=target_namespace)
+    bindings = [
+        (cluster_role_binding_resource, f"{workshop_namespace}-console", None),
+        (role_binding_resource, "eduk8s", f"{workshop_namespace}-sessions"),
+    ]
 
-        for limit_range in limit_ranges.items:
-            limit_range_resource.delete(
-                namespace=target_namespace, name=limit_range.metadata.name
-            )
+    for resource, name, namespace in bindings:
+        try:
+            rbac.update_subjects(resource, name, remove=[subject], namespace=namespace)
+        except ApiException as e:
+            if e.status != 404:
+                raise
 
-    # Create limit ranges for the project namespace so any deployments
-    # will have default memory/cpu min and max values.
 
-    if budget not in ("default", "unlimited"):
-        resource_limits_body = resource_limits_definition
-        limit_range_resource.create(
-            namespace=target_namespace, body=resource_limits_body
-        )
+def _session_user_id(session):
+    # Session names are generated as "{workshop}-{user_id}" and all the
+    # resources for the workshop dashboard are named from the user id.
 
-    # Delete any resource quotas applied to the project namespace that
-    # may conflict with the resource quotas being applied.
+    workshop_name = session["spec"]["name"]
+    return session["metadata"]["name"][len(workshop_name) + 1 :]
 
-    if budget != "default":
-        resource_quotas = resource_quota_resource.get(namespace=target_namespace)
 
-        for resource_quota in resource_quotas.items:
-            resource_quota_resource.delete(
-                namespace=target_namespace, name=resource_quota.metadata.name
-            )
+def _deployment_ready(deployment):
+    replicas = deployment.get("spec", {}).get("replicas", 1)
+    status = deployment.get("status", {})
 
-    # Create resource quotas for the project so there is a maximum for
-    # what resources can be used.
+    return (
+        status.get("observedGeneration", 0)
+        >= deployment["metadata"].get("generation", 0)
+        and status.get("readyReplicas", 0) >= replicas
+    )
 
-    if budget not in ("default", "unlimited"):
-        resource_quota_body = compute_resources_definition
-        resource_quota_resource.create(
-            namespace=target_namespace, body=resource_quota_body
-        )
 
-        resource_quota_body = compute_resources_timebound_definition
-        resource_quota_resource.create(
-            namespace=target_namespace, body=resource_quota_body
-        )
+def _wait_for_deployment(client, namespace, name, timeout):
+    deployment_resource = client.resources.get(api_version="apps/v1", kind="Deployment")
 
-        resource_quota_body = object_counts_definition
-        resource_quota_resource.create(
-            namespace=target_namespace, body=resource_quota_body
-        )
+    deadline = time.monotonic() + timeout
 
+    while time.monotonic() < deadline:
+        remaining = max(1, int(deadline - time.monotonic()))
 
-@group_session.command("create")
-@click.pass_context
-@click.argument("name", required=False)
-@click.option(
-    "--username", default="", help="Set username for authentication.",
-)
-@click.option(
-    "--password", default="", help="Set password for authentication.",
-)
-@click.option(
-    "--hostname", default=None, help="Set hostname for external access.",
-)
-@click.option(
-    "--domain", default=None, help="Domain name to add to generated hostname.",
-)
-@click.option(
-    "--env", multiple=True, help="Environment variables to set for workshop.",
-)
-def command_session_create(ctx, name, username, password, hostname, domain, env):
-    """
-    Create an instance of a workshop.
-    """
+        for event in deployment_resource.watch(
+            namespace=namespace,
+            field_selector=f"metadata.name={name}",
+            timeout=remaining,
+        ):
+            if event["type"] == "DELETED":
+                return False
 
-    # Setup Kubernetes client and make sure custom resources defined.
+            if _deployment_ready(event["raw_object"]):
+                return True
 
-    client = kube.client()
+            if time.monotonic() >= deadline:
+                break
 
-    cluster_role_binding_resource = _resource_type(
-        ctx, client, "rbac.authorization.k8s.io/v1", "ClusterRoleBinding"
-    )
-    deployment_resource = _resource_type(ctx, client, "apps/v1", "Deployment")
-    ingress_resource = _resource_type(ctx, client, "extensions/v1beta1", "Ingress")
-    namespace_resource = _resource_type(ctx, client, "v1", "Namespace")
-    secret_resource = _resource_type(ctx, client, "v1", "Secret")
-    service_resource = _resource_type(ctx, client, "v1", "Service")
-    service_account_resource = _resource_type(ctx, client, "v1", "ServiceAccount")
+    return False
 
-    session_resource = _resource_type(
-        ctx, client, "training.eduk8s.io/v1alpha1", "Session"
-    )
-    workshop_resource = _resource_type(
-        ctx, client, "training.eduk8s.io/v1alpha1", "Workshop"
-    )
 
-    # Verify workshop definition exists and is enabled for use.
+async def _await_deployment(api, namespace, name, timeout):
+    # The same as _wait_for_deployment(), but using the async client.
 
-    try:
-        workshop_instance = workshop_resource.get(name=name)
-    except ApiException as e:
-        if e.status == 404:
-            ctx.fail(f"Workshop with name '{name}' does not exist.")
-        raise
+    deployment_resource = await api.resource("apps/v1", "Deployment")
 
-    if not workshop_instance.status or not workshop_instance.status.enabled:
-        ctx.fail(f"Workshop with name '{name}' is not enabled.")
+    deadline = time.monotonic() + timeout
 
-    # Create session object to act as owner for workshop resources
-    # and create the corresponding namespace as well.
+    while time.monotonic() < deadline:
+        remaining = max(1, int(deadline - time.monotonic()))
 
-    workshop_name = name
-    workshop_namespace = name
+        async for event in api.watch(
+            deployment_resource,
+            namespace=namespace,
+            field_selector=f"metadata.name={name}",
+            timeout=remaining,
+        ):
+            if event["type"] == "DELETED":
+                return False
 
-    random_userid_chars = "bcdfghjklmnpqrstvwxyz0123456789"
+            if _deployment_ready(event["object"]):
+                return True
 
-    def _generate_random_userid(n=5):
-        return "".join(random.choice(random_userid_chars) for _ in range(n))
+            if time.monotonic() >= deadline:
+                break
 
-    count = 0
+    return False
 
-    role = _resource_item(workshop_instance, "spec.session.role", "admin")
-    budget = _resource_item(workshop_instance, "spec.session.budget", "default")
 
-    duration = _resource_item(workshop_instance, "spec.duration", "0s")
-    timeout = _resource_item(workshop_instance, "spec.timeout", "0s")
+def _wait_for_session(client, namespace, user_id, hostname, started, timeout):
+    pod_resource = client.resources.get(api_version="v1", kind="Pod")
+    ingress_resource = client.resources.get(
+        api_version="extensions/v1beta1", kind="Ingress"
+    )
 
-    while True:
-        count += 1
+    # Record how long each startup phase of the pod took. These are taken
+    # from the times the cluster recorded against the pod, relative to
+    # when the pod was created, so they don't depend on how promptly the
+    # watch delivered events. The ingress records no such time, so when
+    # it was admitted is as observed, relative to when the session
+    # creation was started.
 
-        user_id = _generate_random_userid()
+    deadline = time.monotonic() + timeout
 
-        session_name = f"{name}-{user_id}"
+    phases = {}
 
-        session_body = {
-            "apiVersion": "training.eduk8s.io/v1alpha1",
-            "kind": "Session",
-            "metadata": {
-                "name": f"{session_name}",
-                "labels": {"workshop": f"{workshop_name}"},
-                "ownerReferences": [
-                    {
-                        "apiVersion": "training.eduk8s.io/v1alpha1",
-                        "kind": "Workshop",
-                        "blockOwnerDeletion": True,
-                        "controller": True,
-                        "name": f"{workshop_instance.metadata.name}",
-                        "uid": f"{workshop_instance.metadata.uid}",
-                    }
-                ],
-            },
-            "spec": {
-                "vendor": f"{workshop_instance.spec.vendor}",
-                "name": f"{name}",
-                "title": f"{workshop_instance.spec.title}",
-                "description": f"{workshop_instance.spec.description}",
-                "url": f"{workshop_instance.spec.url}",
-                "image": f"{workshop_instance.spec.image}",
-                "budget": f"{budget}",
-                "duration": f"{duration}",
-                "timeout": f"{timeout}",
-            },
-        }
+    def _elapsed(created, timestamp):
+        if created and timestamp:
+            return (_parse_timestamp(timestamp) - created).total_seconds()
 
-        try:
-            session_instance = session_resource.create(body=session_body)
-        except ApiException as e:
-            if e.status == 409:
-                if count > 50:
-                    ctx.fail(f"Failed to create session for workshop '{name}'.")
-                continue
-            else:
-                raise
+    def _watch_pods():
+        while time.monotonic() < deadline:
+            remaining = max(1, int(deadline - time.monotonic()))
 
-        session_uid = session_instance.metadata.uid
+            for event in pod_resource.watch(
+                namespace=namespace,
+                label_selector=f"deployment=workshop-{user_id}",
+                timeout=remaining,
+            ):
+                pod = event["raw_object"]
 
-        session_namespace = session_name
+                if event["type"] == "DELETED":
+                    continue
 
-        namespace_body = {
-            "apiVersion": "v1",
-            "kind": "Namespace",
-            "metadata": {
-                "name": f"{session_namespace}",
-                "ownerReferences": [
-                    {
-                        "apiVersion": "training.eduk8s.io/v1alpha1",
-                        "kind": "Session",
-                        "blockOwnerDeletion": True,
-                        "controller": True,
-                        "name": f"{session_name}",
-                        "uid": f"{session_uid}",
-                    }
-                ],
-            },
-        }
+                created = pod["metadata"].get("creationTimestamp")
+                created = created and _parse_timestamp(created)
 
-        try:
-            namespace_instance = namespace_resource.create(body=namespace_body)
-        except ApiException as e:
-            if e.status == 409:
-                session_resource.delete(body=session_body)
-                continue
-            else:
-                raise
+                status = pod.get("status", {})
 
-        break
+                conditions = {
+                    condition["type"]: condition
+                    for condition in status.get("conditions", [])
+                    if condition.get("status") == "True"
+                }
 
-    # Create service account under which the workshop runs.
+                timestamps = {
+                    "Pod scheduled": conditions.get("PodScheduled", {}).get(
+                        "lastTransitionTime"
+                    ),
+                    "Container ready": conditions.get("Ready", {}).get(
+                        "lastTransitionTime"
+                    ),
+                }
 
-    service_account = f"user-{user_id}"
+                for container in status.get("containerStatuses", []):
+                    if container["name"] == "workshop":
+                        running = container.get("state", {}).get("running") or {}
+                        timestamps["Container started"] = running.get("startedAt")
 
-    service_account_body = {
-        "apiVersion": "v1",
-        "kind": "ServiceAccount",
-        "metadata": {
-            "name": f"{service_account}",
-            "ownerReferences": [
-                {
-                    "apiVersion": "training.eduk8s.io/v1alpha1",
-                    "kind": "Session",
-                    "blockOwnerDeletion": True,
-                    "controller": True,
-                    "name": f"{session_name}",
-                    "uid": f"{session_uid}",
-                }
-            ],
-        },
-    }
+                for phase, timestamp in timestamps.items():
+                    elapsed = _elapsed(created, timestamp)
+                    if elapsed is not None:
+                        phases[phase] = elapsed
 
-    service_account_resource.create(
-        namespace=workshop_namespace, body=service_account_body
-    )
+                if "Ready" in conditions:
+                    return True
 
-    # Create a role binding for access required by the console.
+                if time.monotonic() >= deadline:
+                    break
 
-    cluster_role_binding_body = {
-        "apiVersion": "rbac.authorization.k8s.io/v1",
-        "kind": "ClusterRoleBinding",
-        "metadata": {
-            "name": f"{session_namespace}-console",
-            "ownerReferences": [
-                {
-                    "apiVersion": "training.eduk8s.io/v1alpha1",
-                    "kind": "Session",
-                    "blockOwnerDeletion": True,
-                    "controller": True,
-                    "name": f"{session_name}",
-                    "uid": f"{session_uid}",
-                }
-            ],
-        },
-        "roleRef": {
-            "apiGroup": "rbac.authorization.k8s.io",
-            "kind": "ClusterRole",
-            "name": f"{workshop_namespace}-console",
-        },
-        "subjects": [
-            {
-                "kind": "ServiceAccount",
-                "namespace": f"{workshop_namespace}",
-                "name": f"{service_account}",
-            }
-        ],
-    }
+        return False
 
-    cluster_role_binding_resource.create(body=cluster_role_binding_body)
+    def _watch_ingress():
+        if not hostname:
+            return True
 
-    # Setup project namespace limit ranges and resource quotas.
+        while time.monotonic() < deadline:
+            remaining = max(1, int(deadline - time.monotonic()))
 
-    _setup_limits_and_quotas(
-        ctx,
-        client,
-        workshop_namespace,
-        session_namespace,
-        service_account,
-        role,
-        budget,
-    )
+            for event in ingress_resource.watch(
+                namespace=namespace,
+                field_selector=f"metadata.name=workshop-{user_id}",
+                timeout=remaining,
+            ):
+                ingress = event["raw_object"]
 
-    # Create the additional resources required for the session.
+                status = ingress.get("status", {}).get("loadBalancer", {})
 
-    def _namespaced_resources():
-        api_groups = client.resources.parse_api_groups()
+                if status.get("ingress"):
+                    phases["Ingress admitted"] = time.monotonic() - started
+                    return True
 
-        for api in api_groups.values():
-            for domain, items in api.items():
-                for version, group in items.items():
-                    try:
-                        for kind in group.resources:
-                            if domain:
-                                version = f"{domain}/{version}"
-                            resource = client.resources.get(
-                                api_version=version, kind=kind
-                            )
-                            if type(resource) == Resource and resource.namespaced:
-                                yield (version, resource.kind)
-                    except Exception:
-                        pass
-
-    namespaced_resources = set(_namespaced_resources())
-
-    def _substitute_variables(obj):
-        if isinstance(obj, str):
-            obj = obj.replace("$(user_id)", user_id)
-            obj = obj.replace("$(session_name)", session_name)
-            obj = obj.replace("$(session_uid)", session_uid)
-            obj = obj.replace("$(session_namespace)", session_namespace)
-            obj = obj.replace("$(service_account)", service_account)
-            obj = obj.replace("$(workshop_namespace)", workshop_namespace)
-            return obj
-        elif isinstance(obj, dict):
-            return {k: _substitute_variables(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [_substitute_variables(v) for v in obj]
-        else:
-            return obj
-
-    objects = _resource_item(workshop_instance, "spec.session.objects", [])
-
-    for object_body in objects:
-        kind = object_body.kind
-        api_version = object_body.apiVersion
-
-        if (api_version, kind) not in namespaced_resources:
-            object_body.metadata.ownerReferences = [
-                dict(
-                    apiVersion="training.eduk8s.io/v1alpha1",
-                    kind="Session",
-                    blockOwnerDeletion=True,
-                    controller=True,
-                    name=session_name,
-                    uid=session_uid,
-                )
-            ]
+                if time.monotonic() >= deadline:
+                    break
 
-        object_body = ResourceInstance(client, object_body).to_dict()
-        object_body = _substitute_variables(object_body)
-
-        resource = client.resources.get(api_version=api_version, kind=kind)
-
-        target_namespace = object_body["metadata"].get("namespace", session_namespace)
-
-        if (
-            api_version,
-            kind,
-        ) in namespaced_resources and target_namespace == workshop_namespace:
-            object_body["metadata"]["ownerReferences"] = [
-                dict(
-                    apiVersion="training.eduk8s.io/v1alpha1",
-                    kind="Session",
-                    blockOwnerDeletion=True,
-                    controller=True,
-                    name=session_name,
-                    uid=session_uid,
-                )
-            ]
+        return False
 
-        resource.create(namespace=target_namespace, body=object_body)
+    results = _fan_out(lambda watcher: watcher(), [_watch_pods, _watch_ingress])
 
-        if kind.lower() == "namespace":
-            annotations = object_body["metadata"].get("annotations", {})
+    ready = all(error is None and result for _, result, error in results)
 
-            target_role = annotations.get("session/role", role)
-            target_budget = annotations.get("session/budget", budget)
+    # Confirm the deployment itself reports the rollout as complete.
 
-            extra_namespace = object_body["metadata"]["name"]
+    if ready:
+        remaining = max(1, int(deadline - time.monotonic()))
+        ready = _wait_for_deployment(
+            client, namespace, f"workshop-{user_id}", remaining
+        )
 
-            _setup_limits_and_quotas(
-                ctx,
-                client,
-                workshop_namespace,
-                extra_namespace,
-                service_account,
-                target_role,
-                target_budget,
-            )
+    return ready, phases
 
-    # Deploy the actual workshop dashboard for the session.
+
+@root.group("session")
+@click.pass_context
+def group_session(ctx):
+    """
+    Deploy workshops and manage sessions.
+    """
+
+    pass
+
+
+def _format_age(timestamp, now):
+    if not timestamp:
+        return "-"
+
+    seconds = int((now - _parse_timestamp(timestamp)).total_seconds())
+
+    if seconds < 120:
+        return f"{max(seconds, 0)}s"
+    elif seconds < 7200:
+        return f"{seconds // 60}m"
+    elif seconds < 172800:
+        return f"{seconds // 3600}h"
+
+    return f"{seconds // 86400}d"
+
+
+def _session_details(client):
+    # List the sessions along with the deployments and ingresses for all
+    # sessions, fetching the three lists at the same time, then join them
+    # up using the session label. This takes the same number of requests
+    # no matter how many sessions there are.
+
+    session_resource = client.resources.get(
+        api_version="training.eduk8s.io/v1alpha1", kind="Session"
+    )
+    deployment_resource = client.resources.get(api_version="apps/v1", kind="Deployment")
+    ingress_resource = client.resources.get(
+        api_version="extensions/v1beta1", kind="Ingress"
+    )
+
+    # Sessions and ingresses are listed in the server side table format so
+    # only what is displayed is returned. Deployments are listed in full as
+    # the owner of the session is only found in the pod template.
+
+    def _hosts(ingress):
+        rules = ingress["spec"].get("rules") or []
+        return ",".join(rule["host"] for rule in rules if rule.get("host"))
+
+    listings = _fan_out(
+        lambda function: list(function()),
+        [
+            lambda: kube.list_table(
+                session_resource,
+                {
+                    "Image": lambda session: session["spec"].get("image"),
+                    "URL": lambda session: session["spec"].get("url"),
+                    "Budget": lambda session: session["spec"].get("budget"),
+                },
+            ),
+            lambda: kube.list_items(
+                deployment_resource, label_selector="training.eduk8s.io/session"
+            ),
+            lambda: kube.list_table(
+                ingress_resource,
+                {"Hosts": _hosts},
+                label_selector="training.eduk8s.io/session",
+            ),
+        ],
+    )
+
+    for _, _, error in listings:
+        if error is not None:
+            raise error
+
+    sessions, deployments, ingresses = (items for _, items, _ in listings)
+
+    def _by_session(items):
+        return {
+            item["metadata"]["labels"]["training.eduk8s.io/session"]: item
+            for item in items
+        }
+
+    deployments = _by_session(deployments)
+    ingresses = _by_session(ingresses)
+
+    now = datetime.now(timezone.utc)
+
+    details = []
+
+    for session in sessions:
+        session_name = session["metadata"]["name"]
+
+        ready = "-"
+        owner = "-"
+        hostname = "-"
+
+        deployment = deployments.get(session_name)
+
+        if deployment:
+            status = deployment.get("status") or {}
+            replicas = deployment["spec"].get("replicas", 1)
+            ready = f"{status.get('readyReplicas', 0)}/{replicas}"
+
+            containers = deployment["spec"]["template"]["spec"]["containers"]
+
+            for item in containers[0].get("env") or []:
+                if item.get("name") == "AUTH_USERNAME" and item.get("value"):
+                    owner = item["value"]
+
+        ingress = ingresses.get(session_name)
+
+        if ingress and ingress["Hosts"]:
+            hostname = ingress["Hosts"].split(",")[0]
+
+        details.append(
+            {
+                "name": session_name,
+                "ready": ready,
+                "age": _format_age(session["metadata"].get("creationTimestamp"), now),
+                "budget": session["Budget"] or "-",
+                "hostname": hostname,
+                "owner": owner,
+                "image": session["Image"] or "-",
+                "url": session["URL"] or "-",
+            }
+        )
+
+    return details
+
+
+@group_session.command("list")
+@click.pass_context
+@click.option(
+    "--context",
+    multiple=True,
+    help="Kubernetes context to list sessions from, may be given more than once.",
+)
+def command_session_list(ctx, context):
+    """
+    List active workshop sessions.
+    """
+
+    contexts = list(context) or [None]
+
+    def _list_sessions(context):
+        client = kube.client(context)
+
+        _resource_type(ctx, client, "training.eduk8s.io/v1alpha1", "Session")
+
+        return _session_details(client)
+
+    # Query each cluster concurrently. Any cluster which can't be reached
+    # is reported but doesn't prevent listing the sessions of the others.
+
+    fields = ["name", "ready", "age", "budget", "hostname", "owner", "image", "url"]
+
+    if len(contexts) > 1:
+        cols = [["CONTEXT"] + [field.upper() for field in fields]]
+    else:
+        cols = [[field.upper() for field in fields]]
+
+    data = []
+
+    for context, results, error in _fan_out(_list_sessions, contexts):
+        if error is not None:
+            if len(contexts) == 1:
+                raise error
+            click.echo(f"Error: {context}: {error}", err=True)
+            continue
+
+        for result in results:
+            row = tuple(result[field] for field in fields)
+            data.append((context,) + row if len(contexts) > 1 else row)
+
+    if data:
+        click.echo("\n".join(_format_as_columns(cols, data)))
+    else:
+        click.echo("No active workshop sessions found.")
+
+
+@group_session.command("usage")
+@click.pass_context
+@click.option(
+    "--workshop", default=None, help="Only report on sessions for this workshop.",
+)
+@click.option(
+    "--group-by",
+    type=click.Choice(["session", "workshop", "budget"]),
+    default="session",
+    help="Aggregate usage by session, workshop or budget.",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Choice(["table", "json"]),
+    default="table",
+    help="Output as a table or as JSON lines.",
+)
+def command_session_usage(ctx, workshop, group_by, output):
+    """
+    Report resource quota usage of workshop sessions.
+    """
+
+    client = kube.client()
+
+    limit_range_resource = _resource_type(ctx, client, "v1", "LimitRange")
+    resource_quota_resource = _resource_type(ctx, client, "v1", "ResourceQuota")
+
+    # Quotas and limit ranges created for sessions are labelled with the
+    # workshop, so those for all sessions can be listed across all
+    # namespaces at once, with both lists being fetched concurrently.
+
+    if workshop:
+        label_selector = f"training.eduk8s.io/workshop={workshop}"
+    else:
+        label_selector = "training.eduk8s.io/workshop"
+
+    listings = _fan_out(
+        lambda resource: list(kube.list_items(resource, label_selector=label_selector)),
+        [resource_quota_resource, limit_range_resource],
+    )
+
+    for _, _, error in listings:
+        if error is not None:
+            raise error
+
+    resource_quotas, limit_ranges = (items for _, items, _ in listings)
+
+    def _group_key(item):
+        metadata = item["metadata"]
+        labels = metadata.get("labels") or {}
+        annotations = metadata.get("annotations") or {}
+
+        budget = labels.get(
+            "training.eduk8s.io/budget", annotations.get("resource-budget", "-")
+        )
+
+        if group_by == "workshop":
+            return (labels.get("training.eduk8s.io/workshop", "-"),)
+        elif group_by == "budget":
+            return (budget,)
+
+        return (
+            labels.get("training.eduk8s.io/session", "-"),
+            labels.get("training.eduk8s.io/workshop", "-"),
+            budget,
+        )
+
+    # Add up what is used against what is allowed for each quota in each
+    # group. Quotas are kept separate by name as they apply to different
+    # scopes, such as the quota for pods with a deadline.
+
+    groups = {}
+
+    for resource_quota in resource_quotas:
+        group = groups.setdefault(
+            _group_key(resource_quota), {"sessions": set(), "quotas": {}}
+        )
+
+        labels = resource_quota["metadata"].get("labels") or {}
+
+        group["sessions"].add(
+            labels.get("training.eduk8s.io/session")
+            or resource_quota["metadata"]["namespace"]
+        )
+
+        quota_name = resource_quota["metadata"]["name"]
+        status = resource_quota.get("status") or {}
+
+        hard = status.get("hard") or resource_quota["spec"].get("hard") or {}
+        used = status.get("used") or {}
+
+        totals = group["quotas"].setdefault(quota_name, {})
+
+        for resource_name, value in hard.items():
+            total = totals.setdefault(resource_name, [Decimal(0), Decimal(0)])
+            total[0] += quantity.parse_quantity(used.get(resource_name, 0))
+            total[1] += quantity.parse_quantity(value)
+
+    # The defaults for containers from the limit ranges are included in
+    # the JSON output, as they determine how much of the quota each
+    # container takes up when it doesn't say what it needs.
+
+    defaults = {}
+
+    for limit_range in limit_ranges:
+        for limit in limit_range["spec"].get("limits") or []:
+            if limit.get("type") == "Container":
+                defaults.setdefault(_group_key(limit_range), {}).update(
+                    {
+                        f"default.{name}": value
+                        for name, value in (limit.get("default") or {}).items()
+                    }
+                )
+
+    if group_by == "session":
+        key_names = ["session", "workshop", "budget"]
+    else:
+        key_names = [group_by]
+
+    if output == "json":
+        for key, group in sorted(groups.items()):
+            record = dict(zip(key_names, key))
+            record["sessions"] = len(group["sessions"])
+            record["quotas"] = {
+                quota_name: {
+                    resource_name: {
+                        "used": quantity.format_quantity(used, resource_name),
+                        "hard": quantity.format_quantity(hard, resource_name),
+                    }
+                    for resource_name, (used, hard) in sorted(totals.items())
+                }
+                for quota_name, totals in sorted(group["quotas"].items())
+            }
+            if group_by != "workshop":
+                record["containerDefaults"] = defaults.get(key, {})
+            click.echo(json.dumps(record))
+        return
+
+    cols = [[name.upper() for name in key_names]]
+
+    if group_by != "session":
+        cols[0].append("SESSIONS")
+
+    cols[0].extend(["QUOTA", "RESOURCE", "USED", "HARD", "USE%"])
+
+    data = []
+
+    for key, group in sorted(groups.items()):
+        for quota_name, totals in sorted(group["quotas"].items()):
+            for resource_name, (used, hard) in sorted(totals.items()):
+                row = list(key)
+                if group_by != "session":
+                    row.append(str(len(group["sessions"])))
+                row.extend(
+                    [
+                        quota_name,
+                        resource_name,
+                        quantity.format_quantity(used, resource_name),
+                        quantity.format_quantity(hard, resource_name),
+                        f"{used * 100 / hard:.0f}%" if hard else "-",
+                    ]
+                )
+                data.append(row)
+
+    if data:
+        click.echo("\n".join(_format_as_columns(cols, data)))
+    else:
+        click.echo("No workshop session quotas found.")
+
+
+def _scale_resource_quota(resource_quota, factor):
+    hard = {
+        key: quantity.scale_quantity(value, factor)
+        for key, value in resource_quota["spec"]["hard"].items()
+    }
+
+    return dict(resource_quota, spec=dict(resource_quota["spec"], hard=hard))
+
+
+def _setup_limits_and_quotas(
+    ctx,
+    client,
+    workshop_namespace,
+    target_namespace,
+    service_account,
+    role,
+    budget,
+    scale=1,
+    created=None,
+    labels=None,
+    exist_ok=False,
+):
+    limit_range_resource = _resource_type(ctx, client, "v1", "LimitRange")
+    resource_quota_resource = _resource_type(ctx, client, "v1", "ResourceQuota")
+    role_binding_resource = _resource_type(
+        ctx, client, "rbac.authorization.k8s.io/v1", "RoleBinding"
+    )
+
+    # Create role binding in the project so the users service account
+    # can create resources in it. When there is no service account, the
+    # namespace is shared by sessions, and each session adds its service
+    # account to the binding when created.
+
+    subjects = []
+
+    if service_account:
+        subjects.append(
+            rbac.service_account_subject(service_account, workshop_namespace)
+        )
+
+    role_binding_body = {
+        "apiVersion": "rbac.authorization.k8s.io/v1",
+        "kind": "RoleBinding",
+        "metadata": {"name": "eduk8s"},
+        "roleRef": {
+            "apiGroup": "rbac.authorization.k8s.io",
+            "kind": "ClusterRole",
+            "name": f"{role}",
+        },
+        "subjects": subjects,
+    }
+
+    _create_object(
+        created,
+        role_binding_resource,
+        role_binding_body,
+        namespace=target_namespace,
+        labels=labels,
+        exist_ok=exist_ok,
+    )
+
+    # Determine what project namespace resources need to be used.
+
+    if budget != "unlimited":
+        if budget not in budgets.resource_budgets:
+            budget = "default"
+        elif not budgets.resource_budgets[budget]:
+            budget = "default"
+
+    if budget not in ("default", "unlimited"):
+        budget_item = budgets.resource_budgets[budget]
+
+        resource_limits_definition = budget_item["resource-limits"]
+        compute_resources_definition = budget_item["compute-resources"]
+        compute_resources_timebound_definition = budget_item[
+            "compute-resources-timebound"
+        ]
+        object_counts_definition = budget_item["object-counts"]
+
+        # Quotas for a namespace shared by sessions are scaled up by the
+        # number of sessions the namespace is intended to hold.
+
+        if scale != 1:
+            compute_resources_definition = _scale_resource_quota(
+                compute_resources_definition, scale
+            )
+            compute_resources_timebound_definition = _scale_resource_quota(
+                compute_resources_timebound_definition, scale
+            )
+            object_counts_definition = _scale_resource_quota(
+                object_counts_definition, scale
+            )
+
+    # Limit ranges and quotas are also labelled with the budget so usage
+    # can be reported against the budget from a single list of them.
+
+    budget_labels = dict(labels or {}, **{"training.eduk8s.io/budget": budget})
+
+    # Delete any limit ranges applied to the project that may conflict
+    # with the limit range being applied. For the case of unlimited, we
+    # delete any being applied but don't replace it. When objects are
+    # allowed to already exist, they are being set up again and those
+    # which do exist are what was applied before, so are left alone.
+
+    if budget != "default" and not exist_ok:
+        limit_ranges = kube.list_metadata(
+            limit_range_resource, namespace=target_namespace
+        )
+
+        for metadata in list(limit_ranges):
+            limit_range_resource.delete(
+                namespace=target_namespace, name=metadata["name"]
+            )
+
+    # Create limit ranges for the project namespace so any deployments
+    # will have default memory/cpu min and max values.
+
+    if budget not in ("default", "unlimited"):
+        resource_limits_body = resource_limits_definition
+        _create_object(
+            created,
+            limit_range_resource,
+            resource_limits_body,
+            namespace=target_namespace,
+            labels=budget_labels,
+            exist_ok=exist_ok,
+        )
+
+    # Delete any resource quotas applied to the project namespace that
+    # may conflict with the resource quotas being applied.
+
+    if budget != "default" and not exist_ok:
+        resource_quotas = kube.list_metadata(
+            resource_quota_resource, namespace=target_namespace
+        )
+
+        for metadata in list(resource_quotas):
+            resource_quota_resource.delete(
+                namespace=target_namespace, name=metadata["name"]
+            )
+
+    # Create resource quotas for the project so there is a maximum for
+    # what resources can be used.
+
+    if budget not in ("default", "unlimited"):
+        resource_quota_body = compute_resources_definition
+        _create_object(
+            created,
+            resource_quota_resource,
+            resource_quota_body,
+            namespace=target_namespace,
+            labels=budget_labels,
+            exist_ok=exist_ok,
+        )
+
+        resource_quota_body = compute_resources_timebound_definition
+        _create_object(
+            created,
+            resource_quota_resource,
+            resource_quota_body,
+            namespace=target_namespace,
+            labels=budget_labels,
+            exist_ok=exist_ok,
+        )
+
+        resource_quota_body = object_counts_definition
+        _create_object(
+            created,
+            resource_quota_resource,
+            resource_quota_body,
+            namespace=target_namespace,
+            labels=budget_labels,
+            exist_ok=exist_ok,
+        )
+
+
+def _session_admission(nodes, sessions, overcommit):
+    capacity = [0, 0]
+
+    for node in nodes:
+        if (node.get("spec") or {}).get("unschedulable"):
+            continue
+
+        allocatable = (node.get("status") or {}).get("allocatable") or {}
+
+        capacity[0] += quantity.parse_quantity(allocatable.get("cpu", 0))
+        capacity[1] += quantity.parse_quantity(allocatable.get("memory", 0))
+
+    available = [value * Decimal(str(overcommit)) for value in capacity]
+
+    # Track the sessions which have been counted against the capacity, so
+    # only their deletion returns capacity to the pool.
+
+    counted = {
+        session["metadata"]["name"]: session["spec"].get("budget")
+        for session in sessions
+    }
+
+    cpu, memory = budgets.committed_resources(counted.values())
+
+    available[0] -= cpu
+    available[1] -= memory
+
+    return {
+        "available": available,
+        "sessions": counted,
+        "condition": threading.Condition(),
+        "error": None,
+    }
+
+
+def _admission_available(admission, budget, count=1):
+    cpu, memory = budgets.budget_limits(budget)
+    available = admission["available"]
+    return available[0] >= cpu * count and available[1] >= memory * count
+
+
+def _admission_reserve(admission, budget, timeout):
+    cpu, memory = budgets.budget_limits(budget)
+
+    # Waiting for capacity relies on the deletion of sessions being seen,
+    # so should watching sessions fail, the wait is given up on straight
+    # away with the reason, rather than waiting on capacity which can
+    # never be seen to be returned.
+
+    def _ready():
+        return admission["error"] or _admission_available(admission, budget)
+
+    with admission["condition"]:
+        if not admission["condition"].wait_for(_ready, timeout):
+            return False
+
+        if admission["error"]:
+            raise click.ClickException(
+                f"Failed watching sessions for cluster capacity: "
+                f"{getattr(admission['error'], 'reason', admission['error'])}"
+            )
+
+        admission["available"][0] -= cpu
+        admission["available"][1] -= memory
+
+    return True
+
+
+def _admission_count(admission, name, budget):
+    # Record that capacity reserved for a session is held by the session
+    # of that name, to be returned when the session is deleted.
+
+    with admission["condition"]:
+        admission["sessions"][name] = budget
+
+
+def _admission_uncount(admission, name):
+    # Stop the session of that name holding capacity, without returning
+    # it, for when the session is deleted and the capacity reserved for
+    # it is used for another session instead.
+
+    with admission["condition"]:
+        admission["sessions"].pop(name, None)
+
+
+def _admission_release(admission, budget):
+    cpu, memory = budgets.budget_limits(budget)
+
+    with admission["condition"]:
+        admission["available"][0] += cpu
+        admission["available"][1] += memory
+        admission["condition"].notify_all()
+
+
+def _watch_session_admission(client, admission):
+    session_resource = client.resources.get(
+        api_version="training.eduk8s.io/v1alpha1", kind="Session"
+    )
+
+    # Return the resources committed by sessions to the pool as they are
+    # deleted, waking up anything waiting for capacity. Sessions created
+    # since the sessions were listed, other than by this command, were
+    # never counted, so their deletion has nothing to return.
+
+    def _relist():
+        # List the sessions afresh, returning capacity for any sessions
+        # counted before the list was started but which no longer exist,
+        # as their deletion may have been missed. The sessions counted
+        # may have come from a cached list, or the watch may have been
+        # down. Returns the resource version to watch from.
+
+        with admission["condition"]:
+            counted = set(admission["sessions"])
+
+        sessions = kube.get_object(session_resource)
+
+        names = set(session["metadata"]["name"] for session in sessions["items"])
+
+        for name in counted - names:
+            with admission["condition"]:
+                if name not in admission["sessions"]:
+                    continue
+                budget = admission["sessions"].pop(name)
+
+            _admission_release(admission, budget)
+
+        return sessions["metadata"]["resourceVersion"]
+
+    def _watch():
+        while True:
+            try:
+                resource_version = _relist()
+
+                for event in session_resource.watch(resource_version=resource_version):
+                    # When the resource version being watched from is too
+                    # old, the API server reports the watch as expired, in
+                    # which case the sessions are listed again.
+
+                    if event["type"] == "ERROR":
+                        status = event["raw_object"]
+                        if status.get("code") == 410:
+                            break
+                        raise ApiException(
+                            status=status.get("code"), reason=status.get("message")
+                        )
+
+                    if event["type"] != "DELETED":
+                        continue
+
+                    with admission["condition"]:
+                        name = event["raw_object"]["metadata"]["name"]
+                        if name not in admission["sessions"]:
+                            continue
+                        budget = admission["sessions"].pop(name)
+
+                    _admission_release(admission, budget)
+
+            except Exception as e:
+                if isinstance(e, ApiException) and e.status == 410:
+                    continue
+
+                with admission["condition"]:
+                    admission["error"] = e
+                    admission["condition"].notify_all()
+
+                return
+
+    threading.Thread(target=_watch, daemon=True).start()
+
+
+_cluster_listings_cache = {}
+
+
+def _cluster_listings(client, ttl=15):
+    # List the nodes and sessions of a cluster at the same time, caching
+    # the result for a short time so that placement and admission checks
+    # for a bulk operation don't each need to fetch them again. They are
+    # listed in pages and decoded an item at a time as plain dicts.
+
+    cached = _cluster_listings_cache.get(client)
+
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+
+    node_resource = client.resources.get(api_version="v1", kind="Node")
+    session_resource = client.resources.get(
+        api_version="training.eduk8s.io/v1alpha1", kind="Session"
+    )
+
+    results = _fan_out(
+        lambda resource: list(kube.list_items(resource)),
+        [node_resource, session_resource],
+    )
+
+    for _, _, error in results:
+        if error is not None:
+            raise error
+
+    listings = tuple(result for _, result, _ in results)
+
+    _cluster_listings_cache[client] = (time.monotonic(), listings)
+
+    return listings
+
+
+def _place_sessions(ctx, name, contexts, count, overcommit):
+    # Take a snapshot of the free capacity of each cluster, then place
+    # each session in turn on the cluster with the most room left for
+    # sessions of the budget used by the workshop on that cluster.
+
+    def _snapshot(context):
+        client = kube.client(context)
+
+        workshop_resource = client.resources.get(
+            api_version="training.eduk8s.io/v1alpha1", kind="Workshop"
+        )
+
+        try:
+            workshop_body = kube.get_object(workshop_resource, name)
+        except ApiException as e:
+            if e.status == 404:
+                return None
+            raise
+
+        budget = (workshop_body["spec"].get("session") or {}).get("budget")
+
+        nodes, sessions = _cluster_listings(client)
+
+        admission = _session_admission(nodes, sessions, overcommit)
+
+        return admission["available"], budgets.budget_limits(budget)
+
+    snapshots = {}
+
+    for context, snapshot, error in _fan_out(_snapshot, contexts):
+        if error is not None:
+            click.echo(f"Error: Context '{context}': {error}", err=True)
+        elif snapshot:
+            snapshots[context] = snapshot
+
+    if not snapshots:
+        ctx.fail(f"Workshop with name '{name}' does not exist.")
+
+    placements = {context: 0 for context in snapshots}
+
+    def _room(context):
+        (cpu, memory), (cpu_needed, memory_needed) = snapshots[context]
+        if cpu_needed and memory_needed:
+            return min(cpu / cpu_needed, memory / memory_needed)
+        return cpu / (placements[context] + 1)
+
+    for _ in range(count):
+        context = max(snapshots, key=_room)
+
+        (cpu, memory), (cpu_needed, memory_needed) = snapshots[context]
+        snapshots[context] = (
+            (cpu - cpu_needed, memory - memory_needed),
+            (cpu_needed, memory_needed),
+        )
+
+        placements[context] += 1
+
+    return placements
+
+
+def _setup_shared_namespace(
+    ctx, client, workshop_instance, shared_namespace, role, budget, capacity
+):
+    namespace_resource = _resource_type(ctx, client, "v1", "Namespace")
+    secret_resource = _resource_type(ctx, client, "v1", "Secret")
+
+    workshop_namespace = workshop_instance.metadata.name
+
+    # The namespace shared by sessions is created along with its quotas
+    # when the first session is created. Sessions may be created at the
+    # same time, and an earlier attempt may have failed part way, so the
+    # objects are set up every time, with any which already exist being
+    # left as they are.
+
+    namespace_body = {
+        "apiVersion": "v1",
+        "kind": "Namespace",
+        "metadata": {
+            "name": f"{shared_namespace}",
+            "labels": {"training.eduk8s.io/workshop": f"{workshop_namespace}"},
+            "ownerReferences": [
+                {
+                    "apiVersion": "training.eduk8s.io/v1alpha1",
+                    "kind": "Workshop",
+                    "blockOwnerDeletion": True,
+                    "controller": True,
+                    "name": f"{workshop_instance.metadata.name}",
+                    "uid": f"{workshop_instance.metadata.uid}",
+                }
+            ],
+        },
+    }
+
+    _create_object(None, namespace_resource, namespace_body, exist_ok=True)
+
+    _setup_limits_and_quotas(
+        ctx,
+        client,
+        workshop_namespace,
+        shared_namespace,
+        None,
+        role,
+        budget,
+        scale=capacity,
+        labels={"training.eduk8s.io/workshop": f"{workshop_namespace}"},
+        exist_ok=True,
+    )
 
     secret_body = {
         "apiVersion": "v1",
         "kind": "Secret",
-        "metadata": {"name": "kubernetes-dashboard-csrf"},
+        "metadata": {
+            "name": "kubernetes-dashboard-csrf",
+            "labels": {"training.eduk8s.io/workshop": f"{workshop_namespace}"},
+        },
     }
 
-    secret_resource.create(namespace=session_namespace, body=secret_body)
+    _create_object(
+        None, secret_resource, secret_body, namespace=shared_namespace, exist_ok=True
+    )
+
+
+@group_session.command("create")
+@click.pass_context
+@click.argument("name", required=False)
+@click.option(
+    "--username", default="", help="Set username for authentication.",
+)
+@click.option(
+    "--password", default="", help="Set password for authentication.",
+)
+@click.option(
+    "--hostname", default=None, help="Set hostname for external access.",
+)
+@click.option(
+    "--domain", default=None, help="Domain name to add to generated hostname.",
+)
+@click.option(
+    "--env", multiple=True, help="Environment variables to set for workshop.",
+)
+@click.option(
+    "--pull-policy",
+    default=None,
+    type=click.Choice(["Always", "IfNotPresent", "Never"]),
+    help="Image pull policy for the workshop container.",
+)
+@click.option(
+    "--image-mirror",
+    multiple=True,
+    envvar="EDUK8S_IMAGE_MIRRORS",
+    help="Rewrite image prefix to use a registry mirror (PREFIX=REPLACEMENT).",
+)
+@click.option(
+    "--prefer-cached-nodes",
+    is_flag=True,
+    help="Prefer scheduling on nodes which already have the workshop image.",
+)
+@click.option(
+    "--context",
+    multiple=True,
+    help="Kubernetes context to place sessions on, may be given more than once.",
+)
+@click.option(
+    "--count", default=1, help="Number of sessions to create.",
+)
+@click.option(
+    "--overcommit",
+    default=None,
+    type=float,
+    envvar="EDUK8S_OVERCOMMIT",
+    help="Refuse sessions beyond this ratio of cluster capacity.",
+)
+@click.option(
+    "--queue",
+    is_flag=True,
+    help="Wait for cluster capacity rather than refusing sessions.",
+)
+@click.option(
+    "--wait", is_flag=True, help="Wait for the session to be ready.",
+)
+@click.option(
+    "--timeout",
+    "wait_timeout",
+    default=600,
+    help="Seconds to wait for the session to be ready.",
+)
+def command_session_create(
+    ctx,
+    name,
+    username,
+    password,
+    hostname,
+    domain,
+    env,
+    pull_policy,
+    image_mirror,
+    prefer_cached_nodes,
+    context,
+    count,
+    overcommit,
+    queue,
+    wait,
+    wait_timeout,
+):
+    """
+    Create an instance of a workshop.
+    """
+
+    started = time.monotonic()
+
+    if count > 1 and hostname:
+        ctx.fail("Cannot use --hostname when creating more than one session.")
+
+    # When given more than one cluster, decide how many sessions to place
+    # on each cluster based on its free capacity for sessions.
+
+    contexts = list(context) or [None]
+
+    if len(contexts) == 1:
+        placements = {contexts[0]: count}
+    else:
+        placements = _place_sessions(ctx, name, contexts, count, overcommit or 1.0)
+
+    def _create_on_cluster(context, count):
+        # Setup Kubernetes client and make sure custom resources defined.
+
+        client = kube.client(context)
+
+        cluster_role_binding_resource = _resource_type(
+            ctx, client, "rbac.authorization.k8s.io/v1", "ClusterRoleBinding"
+        )
+        role_binding_resource = _resource_type(
+            ctx, client, "rbac.authorization.k8s.io/v1", "RoleBinding"
+        )
+        deployment_resource = _resource_type(ctx, client, "apps/v1", "Deployment")
+        ingress_resource = _resource_type(ctx, client, "extensions/v1beta1", "Ingress")
+        namespace_resource = _resource_type(ctx, client, "v1", "Namespace")
+        secret_resource = _resource_type(ctx, client, "v1", "Secret")
+        service_resource = _resource_type(ctx, client, "v1", "Service")
+        service_account_resource = _resource_type(ctx, client, "v1", "ServiceAccount")
+
+        session_resource = _resource_type(
+            ctx, client, "training.eduk8s.io/v1alpha1", "Session"
+        )
+        workshop_resource = _resource_type(
+            ctx, client, "training.eduk8s.io/v1alpha1", "Workshop"
+        )
+
+        # Verify workshop definition exists and is enabled for use.
+
+        try:
+            workshop_body = kube.get_object(workshop_resource, name)
+        except ApiException as e:
+            if e.status == 404:
+                ctx.fail(f"Workshop with name '{name}' does not exist.")
+            raise
+
+        if not (workshop_body.get("status") or {}).get("enabled"):
+            ctx.fail(f"Workshop with name '{name}' is not enabled.")
+
+        # Rewrite any images to use registry mirrors. The rendered workshop
+        # is cached so this is only done once for each version of it.
+
+        try:
+            mirrors = images.parse_mirrors(image_mirror)
+        except ValueError as e:
+            ctx.fail(str(e))
+
+        if mirrors:
+            workshop_body = images.render_workshop(workshop_body, mirrors)
+
+        # The session objects and patches are used from the decoded workshop
+        # definition as is, with the resource instance only being used to
+        # look up individual settings.
+
+        workshop_instance = ResourceInstance(client, workshop_body)
+
+        session_spec = workshop_body["spec"].get("session") or {}
+
+        workshop_name = name
+        workshop_namespace = name
+
+        random_userid_chars = "bcdfghjklmnpqrstvwxyz0123456789"
+
+        def _generate_random_userid(n=5):
+            return "".join(random.choice(random_userid_chars) for _ in range(n))
+
+        role = _resource_item(workshop_instance, "spec.session.role", "admin")
+        budget = _resource_item(workshop_instance, "spec.session.budget", "default")
+
+        duration = _resource_item(workshop_instance, "spec.duration", "0s")
+        timeout = _resource_item(workshop_instance, "spec.timeout", "0s")
+
+        # When the workshop uses a shared ingress, the hostname for each
+        # session is always under the domain for the workshop.
+
+        ingress_mode = _resource_item(
+            workshop_instance, "spec.session.ingress.mode", "session"
+        )
+
+        session_domain = domain
+
+        if ingress_mode == "shared":
+            if hostname:
+                ctx.fail(
+                    "Cannot use --hostname when the workshop uses a shared ingress."
+                )
+
+            session_domain = workshop_instance.spec.session.ingress.domain
+
+        console_binding = _resource_item(
+            workshop_instance, "spec.session.consoleBinding", "session"
+        )
+
+        # The nodes and existing sessions are only listed once for all the
+        # sessions being created, and are shared with placement decisions.
+
+        if prefer_cached_nodes or overcommit:
+            nodes, sessions = _cluster_listings(client)
+
+        # When requested, prefer nodes which already have the workshop image
+        # so the image doesn't need to be pulled.
+
+        preferred_nodes = []
+
+        if prefer_cached_nodes:
+            preferred_nodes = images.nodes_with_image(
+                nodes, workshop_instance.spec.image
+            )
+
+        # When an overcommit ratio is given, only admit sessions while the
+        # resources committed to sessions by their budgets stay within the
+        # allocatable capacity of the nodes multiplied by that ratio.
+
+        admission = None
+
+        if overcommit:
+            admission = _session_admission(nodes, sessions, overcommit)
+
+            if queue:
+                _watch_session_admission(client, admission)
+
+            if not queue and not _admission_available(admission, budget, count):
+                ctx.fail(
+                    f"Insufficient cluster capacity for {count} '{budget}' sessions "
+                    f"with overcommit ratio of {overcommit}."
+                )
+
+        # For workshops where sessions share a namespace, make sure the
+        # namespace exists before creating any sessions. Console access is
+        # always granted per workshop in this case.
+
+        namespace_mode = _resource_item(
+            workshop_instance, "spec.session.namespaceMode", "dedicated"
+        )
+
+        shared_namespace = f"{workshop_namespace}-sessions"
+
+        if namespace_mode == "shared":
+            console_binding = "workshop"
+
+            capacity = _resource_item(workshop_instance, "spec.session.capacity", 1)
+
+            _setup_shared_namespace(
+                ctx, client, workshop_instance, shared_namespace, role, budget, capacity
+            )
+
+        image_pull_policy = pull_policy or _resource_item(
+            workshop_instance, "spec.session.imagePullPolicy", "Always"
+        )
+
+        # Work out which resource types are namespaced so that owner
+        # references can be set appropriately on session objects.
+
+        def _namespaced_resources():
+            api_groups = client.resources.parse_api_groups()
+
+            for api in api_groups.values():
+                for domain, items in api.items():
+                    for version, group in items.items():
+                        try:
+                            for kind in group.resources:
+                                if domain:
+                                    version = f"{domain}/{version}"
+                                resource = client.resources.get(
+                                    api_version=version, kind=kind
+                                )
+                                if type(resource) == Resource and resource.namespaced:
+                                    yield (version, resource.kind)
+                        except Exception:
+                            pass
+
+        namespaced_resources = set(_namespaced_resources())
+
+        def _create_session(_):
+            if admission and not _admission_reserve(admission, budget, wait_timeout):
+                raise click.ClickException(
+                    f"Timed out waiting for cluster capacity for '{budget}' session."
+                )
+
+            # Record every object created for the session so that if any
+            # step fails, what was created can be deleted again straight
+            # away rather than leaving a partial session behind.
+
+            created = []
+
+            try:
+                result = _create_session_objects(created)
+
+                metrics.observe(
+                    "eduk8s_session_objects_created", len(created), {"workshop": name}
+                )
+
+                return result
+
+            except Exception:
+                for (resource, _, object_name), error in teardown.delete_objects(
+                    client, created
+                ):
+                    click.echo(
+                        f"Error: Failed to delete {resource.kind.lower()}/{object_name}: "
+                        f"{getattr(error, 'reason', error)}",
+                        err=True,
+                    )
+
+                # The service account for the session may also have been
+                # added to bindings shared by sessions.
+
+                if created:
+                    try:
+                        _unbind_session(
+                            client, workshop_namespace, created[0][2][len(name) + 1 :]
+                        )
+                    except ApiException as e:
+                        click.echo(
+                            f"Error: Failed to unbind session: {e.reason}", err=True
+                        )
+
+                # Return the capacity reserved for the session. When queueing
+                # this happens when the deletion of the session is seen.
+
+                if admission and not (queue and created):
+                    _admission_release(admission, budget)
+
+                raise
+
+        def _create_session_objects(created):
+            # Create session object to act as owner for workshop resources
+            # and create the corresponding namespace as well.
+
+            attempts = 0
+
+            while True:
+                attempts += 1
+
+                user_id = _generate_random_userid()
+
+                session_name = f"{name}-{user_id}"
+
+                # Everything created for the session is labelled with the
+                # workshop and session so it can be found with a selector.
+
+                session_labels = {
+                    "training.eduk8s.io/workshop": f"{workshop_name}",
+                    "training.eduk8s.io/session": f"{session_name}",
+                }
+
+                session_body = {
+                    "apiVersion": "training.eduk8s.io/v1alpha1",
+                    "kind": "Session",
+                    "metadata": {
+                        "name": f"{session_name}",
+                        "labels": dict(session_labels, workshop=f"{workshop_name}"),
+                        "ownerReferences": [
+                            {
+                                "apiVersion": "training.eduk8s.io/v1alpha1",
+                                "kind": "Workshop",
+                                "blockOwnerDeletion": True,
+                                "controller": True,
+                                "name": f"{workshop_instance.metadata.name}",
+                                "uid": f"{workshop_instance.metadata.uid}",
+                            }
+                        ],
+                    },
+                    "spec": {
+                        "vendor": f"{workshop_instance.spec.vendor}",
+                        "name": f"{name}",
+                        "title": f"{workshop_instance.spec.title}",
+                        "description": f"{workshop_instance.spec.description}",
+                        "url": f"{workshop_instance.spec.url}",
+                        "image": f"{workshop_instance.spec.image}",
+                        "budget": f"{budget}",
+                        "duration": f"{duration}",
+                        "timeout": f"{timeout}",
+                    },
+                }
+
+                # Requests for sessions behind the shared ingress are seen by
+                # the router, which records when each session was last used.
+                # The session starts out as having been used when created, so
+                # if never accessed, it can still be found to be idle.
+
+                if ingress_mode == "shared":
+                    session_body["metadata"]["annotations"] = {
+                        "training.eduk8s.io/last-activity": _format_timestamp(
+                            datetime.now(timezone.utc)
+                        )
+                    }
+
+                try:
+                    session_instance = _create_object(
+                        created, session_resource, session_body
+                    )
+
+                    if admission:
+                        _admission_count(admission, session_name, budget)
+
+                except ApiException as e:
+                    if e.status == 409:
+                        metrics.inc(
+                            "eduk8s_session_name_collisions", {"workshop": name}
+                        )
+                        if attempts > 50:
+                            ctx.fail(f"Failed to create session for workshop '{name}'.")
+                        continue
+                    else:
+                        raise
+
+                session_uid = session_instance.metadata.uid
+
+                if namespace_mode == "shared":
+                    session_namespace = shared_namespace
+                    break
+
+                session_namespace = session_name
+
+                namespace_body = {
+                    "apiVersion": "v1",
+                    "kind": "Namespace",
+                    "metadata": {
+                        "name": f"{session_namespace}",
+                        "ownerReferences": [
+                            {
+                                "apiVersion": "training.eduk8s.io/v1alpha1",
+                                "kind": "Session",
+                                "blockOwnerDeletion": True,
+                                "controller": True,
+                                "name": f"{session_name}",
+                                "uid": f"{session_uid}",
+                            }
+                        ],
+                    },
+                }
+
+                try:
+                    _create_object(
+                        created,
+                        namespace_resource,
+                        namespace_body,
+                        labels=session_labels,
+                    )
+                except ApiException as e:
+                    if e.status == 409:
+                        metrics.inc(
+                            "eduk8s_session_name_collisions", {"workshop": name}
+                        )
+
+                        # The capacity reserved is kept for the next attempt,
+                        # so the session must no longer be counted as holding
+                        # it, else it would be returned when the deletion of
+                        # the session is seen.
+
+                        if admission:
+                            _admission_uncount(admission, session_name)
+
+                        session_resource.delete(body=session_body)
+                        created.pop()
+                        continue
+                    else:
+                        raise
+
+                break
+
+            # Create service account under which the workshop runs.
+
+            service_account = f"user-{user_id}"
+
+            service_account_body = {
+                "apiVersion": "v1",
+                "kind": "ServiceAccount",
+                "metadata": {
+                    "name": f"{service_account}",
+                    "ownerReferences": [
+                        {
+                            "apiVersion": "training.eduk8s.io/v1alpha1",
+                            "kind": "Session",
+                            "blockOwnerDeletion": True,
+                            "controller": True,
+                            "name": f"{session_name}",
+                            "uid": f"{session_uid}",
+                        }
+                    ],
+                },
+            }
+
+            _create_object(
+                created,
+                service_account_resource,
+                service_account_body,
+                namespace=workshop_namespace,
+                labels=session_labels,
+            )
+
+            # Create a role binding for access required by the console. When
+            # access is granted per workshop, the service account is instead
+            # added to the binding for the workshop.
+
+            session_subject = rbac.session_subject(workshop_namespace, user_id)
+
+            if console_binding == "workshop":
+                rbac.update_subjects(
+                    cluster_role_binding_resource,
+                    f"{workshop_namespace}-console",
+                    add=[session_subject],
+                )
+
+            else:
+                cluster_role_binding_body = {
+                    "apiVersion": "rbac.authorization.k8s.io/v1",
+                    "kind": "ClusterRoleBinding",
+                    "metadata": {
+                        "name": f"{session_namespace}-console",
+                        "ownerReferences": [
+                            {
+                                "apiVersion": "training.eduk8s.io/v1alpha1",
+                                "kind": "Session",
+                                "blockOwnerDeletion": True,
+                                "controller": True,
+                                "name": f"{session_name}",
+                                "uid": f"{session_uid}",
+                            }
+                        ],
+                    },
+                    "roleRef": {
+                        "apiGroup": "rbac.authorization.k8s.io",
+                        "kind": "ClusterRole",
+                        "name": f"{workshop_namespace}-console",
+                    },
+                    "subjects": [
+                        {
+                            "kind": "ServiceAccount",
+                            "namespace": f"{workshop_namespace}",
+                            "name": f"{service_account}",
+                        }
+                    ],
+                }
+
+                _create_object(
+                    created,
+                    cluster_role_binding_resource,
+                    cluster_role_binding_body,
+                    labels=session_labels,
+                )
+
+            # Setup project namespace limit ranges and resource quotas. These
+            # already exist for a namespace shared by sessions, where only the
+            # service account needs to be added to the role binding. Any
+            # binding of the group of all service accounts in the workshop
+            # namespace, as older shared namespaces had, is also removed.
+
+            if namespace_mode == "shared":
+                rbac.update_subjects(
+                    role_binding_resource,
+                    "eduk8s",
+                    add=[session_subject],
+                    remove=[
+                        {
+                            "kind": "Group",
+                            "name": f"system:serviceaccounts:{workshop_namespace}",
+                        }
+                    ],
+                    namespace=session_namespace,
+                )
+
+            else:
+                _setup_limits_and_quotas(
+                    ctx,
+                    client,
+                    workshop_namespace,
+                    session_namespace,
+                    service_account,
+                    role,
+                    budget,
+                    created=created,
+                    labels=session_labels,
+                )
+
+            # Create the additional resources required for the session.
+
+            def _substitute_variables(obj):
+                if isinstance(obj, str):
+                    obj = obj.replace("$(user_id)", user_id)
+                    obj = obj.replace("$(session_name)", session_name)
+                    obj = obj.replace("$(session_uid)", session_uid)
+                    obj = obj.replace("$(session_namespace)", session_namespace)
+                    obj = obj.replace("$(service_account)", service_account)
+                    obj = obj.replace("$(workshop_namespace)", workshop_namespace)
+                    return obj
+                elif isinstance(obj, dict):
+                    return {k: _substitute_variables(v) for k, v in obj.items()}
+                elif isinstance(obj, list):
+                    return [_substitute_variables(v) for v in obj]
+                else:
+                    return obj
+
+            for object_body in session_spec.get("objects") or []:
+                kind = object_body["kind"]
+                api_version = object_body["apiVersion"]
+
+                object_body = _substitute_variables(object_body)
+
+                if (api_version, kind) not in namespaced_resources:
+                    object_body["metadata"]["ownerReferences"] = [
+                        dict(
+                            apiVersion="training.eduk8s.io/v1alpha1",
+                            kind="Session",
+                            blockOwnerDeletion=True,
+                            controller=True,
+                            name=session_name,
+                            uid=session_uid,
+                        )
+                    ]
+
+                resource = client.resources.get(api_version=api_version, kind=kind)
+
+                target_namespace = object_body["metadata"].get(
+                    "namespace", session_namespace
+                )
+
+                if (
+                    api_version,
+                    kind,
+                ) in namespaced_resources and target_namespace == workshop_namespace:
+                    object_body["metadata"]["ownerReferences"] = [
+                        dict(
+                            apiVersion="training.eduk8s.io/v1alpha1",
+                            kind="Session",
+                            blockOwnerDeletion=True,
+                            controller=True,
+                            name=session_name,
+                            uid=session_uid,
+                        )
+                    ]
+
+                _create_object(
+                    created,
+                    resource,
+                    object_body,
+                    namespace=target_namespace,
+                    labels=session_labels,
+                )
+
+                if kind.lower() == "namespace":
+                    annotations = object_body["metadata"].get("annotations", {})
+
+                    target_role = annotations.get("session/role", role)
+                    target_budget = annotations.get("session/budget", budget)
+
+                    extra_namespace = object_body["metadata"]["name"]
+
+                    _setup_limits_and_quotas(
+                        ctx,
+                        client,
+                        workshop_namespace,
+                        extra_namespace,
+                        service_account,
+                        target_role,
+                        target_budget,
+                        created=created,
+                        labels=session_labels,
+                    )
+
+            # Deploy the actual workshop dashboard for the session.
+
+            secret_body = {
+                "apiVersion": "v1",
+                "kind": "Secret",
+                "metadata": {"name": "kubernetes-dashboard-csrf"},
+            }
+
+            if namespace_mode != "shared":
+                _create_object(
+                    created,
+                    secret_resource,
+                    secret_body,
+                    namespace=session_namespace,
+                    labels=session_labels,
+                )
+
+            session_password = password
+
+            if username and not session_password:
+                session_password = "".join(
+                    random.choice(string.ascii_letters + string.digits + "!@#$%^&*()?")
+                    for _ in range(32)
+                )
+
+            deployment_body = {
+                "apiVersion": "apps/v1",
+                "kind": "Deployment",
+                "metadata": {
+                    "name": f"workshop-{user_id}",
+                    "ownerReferences": [
+                        {
+                            "apiVersion": "training.eduk8s.io/v1alpha1",
+                            "kind": "Session",
+                            "blockOwnerDeletion": True,
+                            "controller": True,
+                            "name": f"{session_name}",
+                            "uid": f"{session_uid}",
+                        }
+                    ],
+                },
+                "spec": {
+                    "replicas": 1,
+                    "selector": {"matchLabels": {"deployment": f"workshop-{user_id}"}},
+                    "strategy": {"type": "Recreate"},
+                    "template": {
+                        "metadata": {
+                            "labels": dict(
+                                session_labels, deployment=f"workshop-{user_id}"
+                            )
+                        },
+                        "spec": {
+                            "serviceAccountName": f"{service_account}",
+                            "containers": [
+                                {
+                                    "name": "workshop",
+                                    "image": f"{workshop_instance.spec.image}",
+                                    "imagePullPolicy": f"{image_pull_policy}",
+                                    "ports": [
+                                        {"containerPort": 10080, "protocol": "TCP"}
+                                    ],
+                                    "env": [
+                                        {
+                                            "name": "SESSION_NAMESPACE",
+                                            "value": f"{session_namespace}",
+                                        },
+                                        {
+                                            "name": "AUTH_USERNAME",
+                                            "value": f"{username}",
+                                        },
+                                        {
+                                            "name": "AUTH_PASSWORD",
+                                            "value": f"{session_password}",
+                                        },
+                                    ],
+                                }
+                            ],
+                        },
+                    },
+                },
+            }
+
+            if preferred_nodes:
+                deployment_body["spec"]["template"]["spec"]["affinity"] = {
+                    "nodeAffinity": {
+                        "preferredDuringSchedulingIgnoredDuringExecution": [
+                            {
+                                "weight": 100,
+                                "preference": {
+                                    "matchFields": [
+                                        {
+                                            "key": "metadata.name",
+                                            "operator": "In",
+                                            "values": preferred_nodes,
+                                        }
+                                    ]
+                                },
+                            }
+                        ]
+                    }
+                }
 
-    if username and not password:
-        password = "".join(
-            random.choice(string.ascii_letters + string.digits + "!@#$%^&*()?")
-            for _ in range(32)
-        )
+            deployment_patch = session_spec.get("patches")
 
-    deployment_body = {
-        "apiVersion": "apps/v1",
-        "kind": "Deployment",
-        "metadata": {
-            "name": f"workshop-{user_id}",
-            "ownerReferences": [
-                {
-                    "apiVersion": "training.eduk8s.io/v1alpha1",
-                    "kind": "Session",
-                    "blockOwnerDeletion": True,
-                    "controller": True,
-                    "name": f"{session_name}",
-                    "uid": f"{session_uid}",
-                }
-            ],
-        },
-        "spec": {
-            "replicas": 1,
-            "selector": {"matchLabels": {"deployment": f"workshop-{user_id}"}},
-            "strategy": {"type": "Recreate"},
-            "template": {
-                "metadata": {"labels": {"deployment": f"workshop-{user_id}"}},
-                "spec": {
-                    "serviceAccountName": f"{service_account}",
-                    "containers": [
+            # Patches for the pod template from the workshop definition are
+            # applied first, then any environment variables given, so they
+            # override those set by the patches.
+
+            pod_template = deployment_body["spec"]["template"]
+
+            if deployment_patch:
+                deployment_patch = _substitute_variables(deployment_patch)
+
+                pod_template = merge.merge(pod_template, deployment_patch)
+
+            environment_patch = []
+
+            for item in env:
+                env_name, env_value = item.split("=", 1)
+                environment_patch.append({"name": env_name, "value": env_value})
+
+            containers = pod_template["spec"].get("containers") or []
+
+            if environment_patch and not containers:
+                ctx.fail(
+                    f"No container to set environment variables for in workshop '{name}'."
+                )
+
+            if environment_patch:
+                container_name = containers[0]["name"]
+
+                pod_template = merge.merge(
+                    pod_template,
+                    {
+                        "spec": {
+                            "containers": [
+                                {"name": container_name, "env": environment_patch}
+                            ]
+                        }
+                    },
+                )
+
+            deployment_body["spec"]["template"] = pod_template
+
+            _create_object(
+                created,
+                deployment_resource,
+                deployment_body,
+                namespace=workshop_namespace,
+                labels=session_labels,
+            )
+
+            service_body = {
+                "apiVersion": "v1",
+                "kind": "Service",
+                "metadata": {
+                    "name": f"workshop-{user_id}",
+                    "ownerReferences": [
                         {
-                            "name": "workshop",
-                            "image": f"{workshop_instance.spec.image}",
-                            "imagePullPolicy": "Always",
-                            "ports": [{"containerPort": 10080, "protocol": "TCP"}],
-                            "env": [
-                                {
-                                    "name": "SESSION_NAMESPACE",
-                                    "value": f"{session_namespace}",
-                                },
-                                {"name": "AUTH_USERNAME", "value": f"{username}",},
-                                {"name": "AUTH_PASSWORD", "value": f"{password}",},
-                            ],
+                            "apiVersion": "training.eduk8s.io/v1alpha1",
+                            "kind": "Session",
+                            "blockOwnerDeletion": True,
+                            "controller": True,
+                            "name": f"{session_name}",
+                            "uid": f"{session_uid}",
                         }
                     ],
                 },
-            },
-        },
-    }
+                "spec": {
+                    "type": "ClusterIP",
+                    "ports": [{"port": 10080, "protocol": "TCP", "targetPort": 10080}],
+                    "selector": {"deployment": f"workshop-{user_id}"},
+                },
+            }
 
-    deployment_patch = _resource_item(workshop_instance, "spec.session.patches", None)
+            _create_object(
+                created,
+                service_resource,
+                service_body,
+                namespace=workshop_namespace,
+                labels=session_labels,
+            )
 
-    def _serialize_field(field):
-        if isinstance(field, ResourceField):
-            return {k: _serialize_field(v) for k, v in field.__dict__.items()}
-        elif isinstance(field, (list, tuple)):
-            return [_serialize_field(item) for item in field]
-        elif isinstance(field, ResourceInstance):
-            return field.to_dict()
-        else:
-            return field
-
-    def _smart_overlay_merge(target, patch):
-        if isinstance(patch, dict):
-            for key, value in patch.items():
-                if key not in target:
-                    target[key] = value
-                elif type(target[key]) != type(value):
-                    target[key] = value
-                elif isinstance(value, (dict, list)):
-                    _smart_overlay_merge(target[key], value)
-                else:
-                    target[key] = value
-        elif isinstance(patch, list):
-            for patch_item in patch:
-                if isinstance(patch_item, dict) and "name" in patch_item:
-                    for i, target_item in enumerate(target):
-                        if (
-                            isinstance(target_item, dict)
-                            and target_item.get("name") == patch_item["name"]
-                        ):
-                            _smart_overlay_merge(target[i], patch_item)
-                            break
+            session_hostname = hostname
+
+            if not session_hostname and session_domain:
+                session_hostname = f"{session_name}.{session_domain}"
+
+            if session_hostname and ingress_mode != "shared":
+                ingress_body = {
+                    "apiVersion": "extensions/v1beta1",
+                    "kind": "Ingress",
+                    "metadata": {
+                        "name": f"workshop-{user_id}",
+                        "ownerReferences": [
+                            {
+                                "apiVersion": "training.eduk8s.io/v1alpha1",
+                                "kind": "Session",
+                                "blockOwnerDeletion": True,
+                                "controller": True,
+                                "name": f"{session_name}",
+                                "uid": f"{session_uid}",
+                            }
+                        ],
+                    },
+                    "spec": {
+                        "rules": [
+                            {
+                                "host": f"{session_hostname}",
+                                "http": {
+                                    "paths": [
+                                        {
+                                            "path": "/",
+                                            "backend": {
+                                                "serviceName": f"workshop-{user_id}",
+                                                "servicePort": 10080,
+                                            },
+                                        }
+                                    ]
+                                },
+                            }
+                        ]
+                    },
+                }
+
+                _create_object(
+                    created,
+                    ingress_resource,
+                    ingress_body,
+                    namespace=workshop_namespace,
+                    labels=session_labels,
+                )
+
+            lines = [
+                f"session.training.eduk8s.io/{session_name} created",
+                "",
+                f"Namespace: {workshop_namespace}",
+                f"Service: workshop-{user_id}",
+                f"Port: 10080",
+            ]
+
+            if session_hostname:
+                lines.append(f"URL: http://{session_hostname}/")
+
+            if username:
+                lines.append(f"Username: {username}")
+                lines.append(f"Password: {session_password}")
+
+            # Optionally wait for the session to be ready, reporting how long
+            # each phase of the startup took.
+
+            ready = True
+
+            if wait:
+                phases = {"Objects created": time.monotonic() - started}
+
+                ingress_hostname = ingress_mode != "shared" and session_hostname
+
+                ready, observed = _wait_for_session(
+                    client,
+                    workshop_namespace,
+                    user_id,
+                    ingress_hostname,
+                    started,
+                    wait_timeout,
+                )
+
+                phases.update(observed)
+
+                lines.append("")
+
+                # Times for the pod come from the cluster, which only records
+                # them to the second, and are from when the pod was created.
+
+                lines.append(f"Objects created: {phases['Objects created']:.1f}s")
+
+                for phase in ("Pod scheduled", "Container started", "Container ready"):
+                    if phase in phases:
+                        lines.append(f"{phase}: {phases[phase]:.0f}s after pod created")
                     else:
-                        target.append(patch_item)
-                else:
-                    target.append(patch_item)
+                        lines.append(f"{phase}: -")
+
+                if ingress_hostname:
+                    if "Ingress admitted" in phases:
+                        lines.append(
+                            f"Ingress admitted: {phases['Ingress admitted']:.1f}s"
+                        )
+                    else:
+                        lines.append("Ingress admitted: -")
 
-    deployment_patch = _serialize_field(deployment_patch)
+            return session_name, lines, ready
 
-    if deployment_patch:
-        deployment_patch = _substitute_variables(deployment_patch)
+        # Create the sessions, concurrently when there is more than one. The
+        # cached listings no longer reflect the cluster once done.
 
-        _smart_overlay_merge(deployment_body["spec"]["template"], deployment_patch)
+        try:
+            return _fan_out(_create_session, range(count))
+        finally:
+            _cluster_listings_cache.pop(client, None)
 
-    environment_patch = []
+    # Create the sessions on each cluster concurrently and report the
+    # details of each.
 
-    for item in env:
-        name, value = item.split("=", 1)
-        environment_patch.append({"name": name, "value": value})
+    clusters = _fan_out(
+        lambda context: _create_on_cluster(context, placements[context]),
+        [context for context in contexts if placements.get(context)],
+    )
 
-    if environment_patch:
-        if (
-            deployment_body["spec"]["template"]["spec"]["containers"][0].get("env")
-            is None
-        ):
-            deployment_body["spec"]["template"]["spec"]["containers"][0][
-                "env"
-            ] = environment_patch
-        else:
-            _smart_overlay_merge(
-                deployment_body["spec"]["template"]["spec"]["containers"][0]["env"],
-                environment_patch,
+    results = []
+
+    for context, result, error in clusters:
+        if error is not None:
+            if len(clusters) == 1:
+                raise error
+            result = [(None, None, error)] * placements[context]
+        results.extend((context, item) for item in result)
+
+    failed = False
+
+    for index, (context, (_, result, error)) in enumerate(results):
+        if index:
+            click.echo()
+
+        if error is not None:
+            if count == 1:
+                raise error
+            failed = True
+            click.echo(f"Error: {error}", err=True)
+            continue
+
+        session_name, lines, ready = result
+
+        if len(contexts) > 1:
+            lines.insert(2, f"Context: {context}")
+
+        for line in lines:
+            click.echo(line)
+
+        if not ready:
+            message = (
+                f"Session '{session_name}' not ready after {wait_timeout} seconds."
             )
+            if count == 1:
+                ctx.fail(message)
+            failed = True
+            click.echo(f"Error: {message}", err=True)
 
-    deployment_resource.create(namespace=workshop_namespace, body=deployment_body)
+    # Let the user know when the API server was pushing back, as this is
+    # why creating many sessions may have been slower than expected.
 
-    service_body = {
-        "apiVersion": "v1",
-        "kind": "Service",
-        "metadata": {
-            "name": f"workshop-{user_id}",
-            "ownerReferences": [
-                {
-                    "apiVersion": "training.eduk8s.io/v1alpha1",
-                    "kind": "Session",
-                    "blockOwnerDeletion": True,
-                    "controller": True,
-                    "name": f"{session_name}",
-                    "uid": f"{session_uid}",
-                }
-            ],
-        },
-        "spec": {
-            "type": "ClusterIP",
-            "ports": [{"port": 10080, "protocol": "TCP", "targetPort": 10080}],
-            "selector": {"deployment": f"workshop-{user_id}"},
-        },
-    }
+    totals = kube.counters()
 
-    service_resource.create(namespace=workshop_namespace, body=service_body)
+    if count > 1 and totals["retries"]:
+        click.echo(
+            f"Retried {totals['retries']} requests to the API server, "
+            f"{totals['throttled']} due to throttling.",
+            err=True,
+        )
 
-    if not hostname and domain:
-        hostname = f"{session_name}.{domain}"
+    if failed:
+        ctx.exit(1)
 
-    if hostname:
-        ingress_body = {
-            "apiVersion": "extensions/v1beta1",
-            "kind": "Ingress",
-            "metadata": {
-                "name": f"workshop-{user_id}",
-                "ownerReferences": [
-                    {
-                        "apiVersion": "training.eduk8s.io/v1alpha1",
-                        "kind": "Session",
-                        "blockOwnerDeletion": True,
-                        "controller": True,
-                        "name": f"{session_name}",
-                        "uid": f"{session_uid}",
-                    }
-                ],
-            },
-            "spec": {
-                "rules": [
-                    {
-                        "host": f"{hostname}",
-                        "http": {
-                            "paths": [
-                                {
-                                    "path": "/",
-                                    "backend": {
-                                        "serviceName": f"workshop-{user_id}",
-                                        "servicePort": 10080,
-                                    },
-                                }
-                            ]
-                        },
-                    }
-                ]
-            },
-        }
 
-        ingress_resource.create(namespace=workshop_namespace, body=ingress_body)
+def _session_dependents(client, session):
+    # The resources for the workshop dashboard of a session are all in the
+    # workshop namespace and named from the user id. Namespaces and other
+    # cluster scoped objects are found from their owner references.
+
+    workshop_namespace = session["spec"]["name"]
+    user_id = _session_user_id(session)
+
+    deployment_resource = client.resources.get(api_version="apps/v1", kind="Deployment")
+    ingress_resource = client.resources.get(
+        api_version="extensions/v1beta1", kind="Ingress"
+    )
+    service_resource = client.resources.get(api_version="v1", kind="Service")
+    service_account_resource = client.resources.get(
+        api_version="v1", kind="ServiceAccount"
+    )
 
-    click.echo(f"session.training.eduk8s.io/{session_name} created")
+    objects = [
+        (deployment_resource, workshop_namespace, f"workshop-{user_id}"),
+        (service_resource, workshop_namespace, f"workshop-{user_id}"),
+        (ingress_resource, workshop_namespace, f"workshop-{user_id}"),
+        (service_account_resource, workshop_namespace, f"user-{user_id}"),
+    ]
 
-    click.echo()
-    click.echo(f"Namespace: {workshop_namespace}")
-    click.echo(f"Service: workshop-{user_id}")
-    click.echo(f"Port: 10080")
+    metadata = session["metadata"]
 
-    if hostname:
-        click.echo(f"URL: http://{hostname}/")
+    objects.extend(
+        teardown.owned_objects(
+            client, [metadata["uid"]], f"training.eduk8s.io/session={metadata['name']}"
+        )
+    )
 
-    if username:
-        click.echo(f"Username: {username}")
-        click.echo(f"Password: {password}")
+    return objects
 
 
 @group_session.command("delete")
 @click.pass_context
 @click.argument("name", required=False)
-def command_session_deploy(ctx, name):
+@click.option(
+    "--context",
+    multiple=True,
+    help="Kubernetes context to delete the session from, may be given more than once.",
+)
+@click.option(
+    "--fast",
+    is_flag=True,
+    help="Delete resources for the session directly, not by garbage collection.",
+)
+@click.option(
+    "--wait", is_flag=True, help="Wait for the session and resources to be deleted.",
+)
+@click.option(
+    "--timeout", default=600, help="Seconds to wait for the session to be deleted.",
+)
+def command_session_deploy(ctx, name, context, fast, wait, timeout):
     """
     Delete an instance of a workshop.
     """
 
+    started = time.monotonic()
+
+    contexts = list(context) or [None]
+
+    # Normally the resources for the session are left for the garbage
+    # collector to delete, with foreground deletion used when waiting so
+    # the session is only gone once its resources are. With a fast delete
+    # the known resources are deleted directly and at the same time.
+
+    if fast or not wait:
+        propagation_policy = "Background"
+    else:
+        propagation_policy = "Foreground"
+
+    def _delete_session(context):
+        client = kube.client(context)
+
+        session_resource = _resource_type(
+            ctx, client, "training.eduk8s.io/v1alpha1", "Session"
+        )
+
+        objects = [(session_resource, None, name)]
+
+        # Only the metadata is needed to check the session exists, unless
+        # the resources for the session are to be found from its spec.
+
+        if fast:
+            session_body = kube.get_object(session_resource, name)
+            objects.extend(_session_dependents(client, session_body))
+            workshop_name = session_body["spec"]["name"]
+        else:
+            session_metadata = kube.get_metadata(session_resource, name)
+            workshop_name = (session_metadata.get("labels") or {}).get("workshop")
+
+        failures = teardown.delete_objects(client, objects, propagation_policy)
+
+        if failures:
+            raise failures[0][1]
+
+        if workshop_name:
+            _unbind_session(client, workshop_name, name[len(workshop_name) + 1 :])
+
+        if wait and teardown.wait_for_deletion(
+            client, objects, timeout - (time.monotonic() - started)
+        ):
+            raise click.ClickException(
+                f"Session '{name}' not deleted after {timeout} seconds."
+            )
+
+    if len(contexts) == 1:
+        try:
+            _delete_session(contexts[0])
+            click.echo(f"session.training.eduk8s.io/{name} deleted")
+        except ApiException as e:
+            ctx.fail(e.reason)
+
+    else:
+        # The session will only exist on the one cluster it was placed on,
+        # so try all of them concurrently, ignoring where it isn't found.
+
+        deleted = False
+
+        for context, _, error in _fan_out(_delete_session, contexts):
+            if error is None:
+                deleted = True
+                click.echo(f"session.training.eduk8s.io/{name} deleted ({context})")
+            elif isinstance(error, click.ClickException):
+                raise error
+            elif not isinstance(error, ApiException) or error.status != 404:
+                ctx.fail(f"{context}: {getattr(error, 'reason', error)}")
+
+        if not deleted:
+            ctx.fail(f"Session '{name}' not found.")
+
+    if wait:
+        click.echo(f"Teardown completed in {time.monotonic() - started:.1f}s")
+
+
+def _select_sessions(ctx, session_resource, name, workshop, selector, everything):
+    if name:
+        try:
+            return [kube.get_object(session_resource, name)]
+        except ApiException as e:
+            if e.status == 404:
+                ctx.fail(f"Session with name '{name}' does not exist.")
+            raise
+
+    label_selector = []
+
+    if workshop:
+        label_selector.append(f"workshop={workshop}")
+    if selector:
+        label_selector.append(selector)
+
+    if not label_selector and not everything:
+        ctx.fail("Provide a session name, --workshop, --selector or --all.")
+
+    return list(
+        kube.list_items(
+            session_resource, label_selector=",".join(label_selector) or None
+        )
+    )
+
+
+def _session_idle(session, now):
+    # A session is idle if it has a timeout and hasn't been used for longer
+    # than that timeout. When a session was last used is recorded by the
+    # router for workshops using a shared ingress, and may otherwise be
+    # kept up to date by anything else as a heartbeat. Sessions with no
+    # such record are never idle, as there is no telling if they are used.
+
+    timeout = _parse_duration(session["spec"].get("timeout"))
+
+    if not timeout:
+        return False
+
+    annotations = session["metadata"].get("annotations") or {}
+    last_activity = annotations.get("training.eduk8s.io/last-activity")
+
+    if not last_activity:
+        return False
+
+    return (now - _parse_timestamp(last_activity)).total_seconds() > timeout
+
+
+async def _scale_session(api, session, replicas):
+    deployment_resource = await api.resource("apps/v1", "Deployment")
+    session_resource = await api.resource("training.eduk8s.io/v1alpha1", "Session")
+
+    # Scale the workshop dashboard deployment, leaving the namespace and
+    # all other session resources in place, then record the state change
+    # against the session.
+
+    user_id = _session_user_id(session)
+
+    deployment_body = {"spec": {"replicas": replicas}}
+
+    await api.patch(
+        deployment_resource,
+        f"workshop-{user_id}",
+        deployment_body,
+        namespace=session["spec"]["name"],
+    )
+
+    now = _format_timestamp(datetime.now(timezone.utc))
+
+    # Where when the session was last used is recorded, resuming it counts
+    # as using it, so that it isn't straight away found to be idle again.
+
+    if replicas:
+        annotations = {"training.eduk8s.io/suspended": None}
+        if "training.eduk8s.io/last-activity" in (
+            session["metadata"].get("annotations") or {}
+        ):
+            annotations["training.eduk8s.io/last-activity"] = now
+    else:
+        annotations = {"training.eduk8s.io/suspended": now}
+
+    session_body = {"metadata": {"annotations": annotations}}
+
+    await api.patch(session_resource, session["metadata"]["name"], session_body)
+
+
+@group_session.command("suspend")
+@click.pass_context
+@click.argument("name", required=False)
+@click.option(
+    "--workshop", default=None, help="Suspend all sessions for the workshop.",
+)
+@click.option(
+    "-l", "--selector", default=None, help="Label selector for sessions to suspend.",
+)
+@click.option(
+    "--all", "everything", is_flag=True, help="Suspend all sessions.",
+)
+@click.option(
+    "--idle",
+    is_flag=True,
+    help="Only suspend sessions not used for longer than their timeout. "
+    "Sessions with no record of when they were last used are skipped.",
+)
+def command_session_suspend(ctx, name, workshop, selector, everything, idle):
+    """
+    Suspend workshop sessions by scaling them down.
+    """
+
     client = kube.client()
 
     session_resource = _resource_type(
         ctx, client, "training.eduk8s.io/v1alpha1", "Session"
     )
 
-    try:
-        session_resource.delete(name=name)
-        click.echo(f"session.training.eduk8s.io/{name} deleted")
-    except ApiException as e:
-        ctx.fail(e.reason)
+    sessions = _select_sessions(
+        ctx, session_resource, name, workshop, selector, everything or idle
+    )
+
+    # Skip sessions which are already suspended, and when only targeting
+    # idle sessions, those which have been used within their timeout.
+
+    now = datetime.now(timezone.utc)
+
+    def _eligible(session):
+        annotations = session["metadata"].get("annotations") or {}
+        if annotations.get("training.eduk8s.io/suspended"):
+            return False
+        return not idle or _session_idle(session, now)
+
+    sessions = [session for session in sessions if _eligible(session)]
+
+    async def _suspend(api):
+        return await aio.fan_out(
+            lambda session: _scale_session(api, session, 0), sessions
+        )
+
+    results = aio.run(client, _suspend)
+
+    failed = False
+
+    for session, _, error in results:
+        session_name = session["metadata"]["name"]
+        if error is None:
+            click.echo(f"session.training.eduk8s.io/{session_name} suspended")
+        else:
+            failed = True
+            click.echo(
+                f"session.training.eduk8s.io/{session_name} failed: {error}", err=True,
+            )
+
+    if failed:
+        ctx.exit(1)
+
+
+@group_session.command("resume")
+@click.pass_context
+@click.argument("name", required=False)
+@click.option(
+    "--workshop", default=None, help="Resume all sessions for the workshop.",
+)
+@click.option(
+    "-l", "--selector", default=None, help="Label selector for sessions to resume.",
+)
+@click.option(
+    "--all", "everything", is_flag=True, help="Resume all sessions.",
+)
+@click.option(
+    "--wait/--no-wait", default=True, help="Wait for sessions to be ready.",
+)
+@click.option(
+    "--timeout", default=300, help="Seconds to wait for sessions to be ready.",
+)
+def command_session_resume(ctx, name, workshop, selector, everything, wait, timeout):
+    """
+    Resume suspended workshop sessions.
+    """
+
+    client = kube.client()
+
+    session_resource = _resource_type(
+        ctx, client, "training.eduk8s.io/v1alpha1", "Session"
+    )
+
+    sessions = _select_sessions(
+        ctx, session_resource, name, workshop, selector, everything
+    )
+
+    # Scale up all the sessions before waiting on any of them, so they all
+    # start at once and the time taken is that of the slowest to start.
+
+    async def _ready(api, session):
+        user_id = _session_user_id(session)
+        return await _await_deployment(
+            api, session["spec"]["name"], f"workshop-{user_id}", timeout
+        )
+
+    async def _resume_all(api):
+        results = await aio.fan_out(
+            lambda session: _scale_session(api, session, 1), sessions
+        )
+
+        if not wait:
+            return [(session, True, error) for session, _, error in results]
+
+        failed = [result for result in results if result[2] is not None]
+        scaled = [session for session, _, error in results if error is None]
+
+        return failed + await aio.fan_out(lambda session: _ready(api, session), scaled)
+
+    results = aio.run(client, _resume_all)
+
+    failed = False
+
+    for session, ready, error in results:
+        session_name = session["metadata"]["name"]
+        if error is not None:
+            failed = True
+            click.echo(
+                f"session.training.eduk8s.io/{session_name} failed: {error}", err=True,
+            )
+        elif not ready:
+            failed = True
+            click.echo(f"session.training.eduk8s.io/{session_name} not ready", err=True)
+        else:
+            click.echo(f"session.training.eduk8s.io/{session_name} resumed")
+
+    if failed:
+        ctx.exit(1)
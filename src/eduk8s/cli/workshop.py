@@ -1,3 +1,8 @@
+import time
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
 import yaml
 
 import click
@@ -5,10 +10,16 @@ import requests
 
 from kubernetes.client.rest import ApiException
 from openshift.dynamic.exceptions import ResourceNotFoundError
-from openshift.dynamic import Resource, ResourceField, ResourceInstance
+from openshift.dynamic import Resource
 
 from ..cli import root
+from .. import budgets
+from .. import images
 from .. import kube
+from ..kube import aio, quantity
+from .. import rbac
+from .. import router
+from .. import teardown
 
 
 def _format_as_columns(columns, data):
@@ -35,6 +46,188 @@ def _resource_item(resource, path, default):
     return item
 
 
+def _create_router(ctx, client, workshop_instance, workshop_namespace):
+    service_account_resource = _resource_type(ctx, client, "v1", "ServiceAccount")
+    cluster_role_resource = _resource_type(
+        ctx, client, "rbac.authorization.k8s.io/v1", "ClusterRole"
+    )
+    cluster_role_binding_resource = _resource_type(
+        ctx, client, "rbac.authorization.k8s.io/v1", "ClusterRoleBinding"
+    )
+    deployment_resource = _resource_type(ctx, client, "apps/v1", "Deployment")
+    service_resource = _resource_type(ctx, client, "v1", "Service")
+    ingress_resource = _resource_type(ctx, client, "extensions/v1beta1", "Ingress")
+
+    workshop_name = workshop_instance.metadata.name
+    workshop_uid = workshop_instance.metadata.uid
+
+    domain = workshop_instance.spec.session.ingress.domain
+    router_image = workshop_instance.spec.session.ingress.routerImage
+
+    owner_references = [
+        {
+            "apiVersion": "training.eduk8s.io/v1alpha1",
+            "kind": "Workshop",
+            "blockOwnerDeletion": True,
+            "controller": True,
+            "name": f"{workshop_name}",
+            "uid": f"{workshop_uid}",
+        }
+    ]
+
+    labels = {"training.eduk8s.io/workshop": f"{workshop_name}"}
+
+    # The router needs to be able to watch the sessions for the workshop
+    # to know where to route requests for each session hostname, and to
+    # patch them to record when each session was last accessed.
+
+    service_account_body = {
+        "apiVersion": "v1",
+        "kind": "ServiceAccount",
+        "metadata": {
+            "name": "router",
+            "labels": labels,
+            "ownerReferences": owner_references,
+        },
+    }
+
+    service_account_resource.create(
+        namespace=workshop_namespace, body=service_account_body
+    )
+
+    cluster_role_body = {
+        "apiVersion": "rbac.authorization.k8s.io/v1",
+        "kind": "ClusterRole",
+        "metadata": {
+            "name": f"{workshop_namespace}-router",
+            "labels": labels,
+            "ownerReferences": owner_references,
+        },
+        "rules": [
+            {
+                "apiGroups": ["training.eduk8s.io"],
+                "resources": ["sessions"],
+                "verbs": ["get", "list", "watch", "patch"],
+            }
+        ],
+    }
+
+    cluster_role_resource.create(body=cluster_role_body)
+
+    cluster_role_binding_body = {
+        "apiVersion": "rbac.authorization.k8s.io/v1",
+        "kind": "ClusterRoleBinding",
+        "metadata": {
+            "name": f"{workshop_namespace}-router",
+            "labels": labels,
+            "ownerReferences": owner_references,
+        },
+        "roleRef": {
+            "apiGroup": "rbac.authorization.k8s.io",
+            "kind": "ClusterRole",
+            "name": f"{workshop_namespace}-router",
+        },
+        "subjects": [
+            {
+                "kind": "ServiceAccount",
+                "namespace": f"{workshop_namespace}",
+                "name": "router",
+            }
+        ],
+    }
+
+    cluster_role_binding_resource.create(body=cluster_role_binding_body)
+
+    # Deploy the router, and route all hosts under the domain to it
+    # with a single wildcard ingress.
+
+    deployment_body = {
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {
+            "name": "router",
+            "labels": labels,
+            "ownerReferences": owner_references,
+        },
+        "spec": {
+            "replicas": 1,
+            "selector": {"matchLabels": {"deployment": "router"}},
+            "template": {
+                "metadata": {"labels": dict(labels, deployment="router")},
+                "spec": {
+                    "serviceAccountName": "router",
+                    "containers": [
+                        {
+                            "name": "router",
+                            "image": f"{router_image}",
+                            "command": [
+                                "eduk8s",
+                                "workshop",
+                                "router",
+                                f"{workshop_name}",
+                                "--domain",
+                                f"{domain}",
+                                "--port",
+                                "8080",
+                            ],
+                            "ports": [{"containerPort": 8080, "protocol": "TCP"}],
+                        }
+                    ],
+                },
+            },
+        },
+    }
+
+    deployment_resource.create(namespace=workshop_namespace, body=deployment_body)
+
+    service_body = {
+        "apiVersion": "v1",
+        "kind": "Service",
+        "metadata": {
+            "name": "router",
+            "labels": labels,
+            "ownerReferences": owner_references,
+        },
+        "spec": {
+            "type": "ClusterIP",
+            "ports": [{"port": 8080, "protocol": "TCP", "targetPort": 8080}],
+            "selector": {"deployment": "router"},
+        },
+    }
+
+    service_resource.create(namespace=workshop_namespace, body=service_body)
+
+    ingress_body = {
+        "apiVersion": "extensions/v1beta1",
+        "kind": "Ingress",
+        "metadata": {
+            "name": "router",
+            "labels": labels,
+            "ownerReferences": owner_references,
+        },
+        "spec": {
+            "rules": [
+                {
+                    "host": f"*.{domain}",
+                    "http": {
+                        "paths": [
+                            {
+                                "path": "/",
+                                "backend": {
+                                    "serviceName": "router",
+                                    "servicePort": 8080,
+                                },
+                            }
+                        ]
+                    },
+                }
+            ]
+        },
+    }
+
+    ingress_resource.create(namespace=workshop_namespace, body=ingress_body)
+
+
 @root.group("workshop")
 @click.pass_context
 def group_workshop(ctx):
@@ -53,7 +246,13 @@ def group_workshop(ctx):
 @click.option(
     "--name", default=None, help="Set name to use for the workshop.",
 )
-def command_workshop_create(ctx, filename, name):
+@click.option(
+    "--image-mirror",
+    multiple=True,
+    envvar="EDUK8S_IMAGE_MIRRORS",
+    help="Rewrite image prefix to use a registry mirror (PREFIX=REPLACEMENT).",
+)
+def command_workshop_create(ctx, filename, name, image_mirror):
     """
     Import workshop and configure resources.
     """
@@ -76,6 +275,23 @@ def command_workshop_create(ctx, filename, name):
             raise
             ctx.fail("Failed to load workshop definition.")
 
+    # Rewrite any images to use registry mirrors.
+
+    try:
+        mirrors = images.parse_mirrors(image_mirror)
+    except ValueError as e:
+        ctx.fail(str(e))
+
+    body = images.rewrite_workshop(body, mirrors)
+
+    # Check that shared ingress routing has what it needs.
+
+    ingress = ((body.get("spec") or {}).get("session") or {}).get("ingress") or {}
+
+    if ingress.get("mode") == "shared":
+        if not ingress.get("domain") or not ingress.get("routerImage"):
+            ctx.fail("Shared ingress routing requires a domain and router image.")
+
     client = kube.client()
 
     workshop_resource = _resource_type(
@@ -85,6 +301,15 @@ def command_workshop_create(ctx, filename, name):
     if name:
         body["metadata"]["name"] = name
 
+    # Label the workshop and everything created for it with the name of
+    # the workshop so they can be found with a selector.
+
+    workshop_labels = {"training.eduk8s.io/workshop": body["metadata"]["name"]}
+
+    body["metadata"]["labels"] = dict(
+        body["metadata"].get("labels") or {}, **workshop_labels
+    )
+
     workshop_instance = None
 
     try:
@@ -110,6 +335,7 @@ def command_workshop_create(ctx, filename, name):
         "kind": "Namespace",
         "metadata": {
             "name": f"{workshop_namespace}",
+            "labels": workshop_labels,
             "ownerReferences": [
                 {
                     "apiVersion": "training.eduk8s.io/v1alpha1",
@@ -136,6 +362,7 @@ def command_workshop_create(ctx, filename, name):
         "kind": "ClusterRole",
         "metadata": {
             "name": f"{workshop_namespace}-console",
+            "labels": {"training.eduk8s.io/workshop": f"{workshop_name}"},
             "ownerReferences": [
                 {
                     "apiVersion": "training.eduk8s.io/v1alpha1",
@@ -154,6 +381,40 @@ def command_workshop_create(ctx, filename, name):
 
     cluster_role_resource.create(body=cluster_role_body)
 
+    # When console access is granted per workshop rather than per
+    # session, there is one binding of the cluster role for all sessions,
+    # to which each session adds its service account. This is always the
+    # case when sessions share a namespace.
+
+    console_binding = _resource_item(
+        workshop_instance, "spec.session.consoleBinding", "session"
+    )
+
+    namespace_mode = _resource_item(
+        workshop_instance, "spec.session.namespaceMode", "dedicated"
+    )
+
+    if console_binding == "workshop" or namespace_mode == "shared":
+        cluster_role_binding_resource = _resource_type(
+            ctx, client, "rbac.authorization.k8s.io/v1", "ClusterRoleBinding"
+        )
+
+        cluster_role_binding_resource.create(
+            body=rbac.console_binding_body(
+                workshop_name, workshop_uid, workshop_namespace
+            )
+        )
+
+    # When sessions share a single ingress, deploy the router which
+    # routes requests for each session hostname to the session.
+
+    ingress_mode = _resource_item(
+        workshop_instance, "spec.session.ingress.mode", "session"
+    )
+
+    if ingress_mode == "shared":
+        _create_router(ctx, client, workshop_instance, workshop_namespace)
+
     # Create the additional resources required for the workshop.
 
     def _namespaced_resources():
@@ -189,14 +450,16 @@ def command_workshop_create(ctx, filename, name):
         else:
             return obj
 
-    objects = _resource_item(workshop_instance, "spec.workshop.objects", [])
+    objects = ((body["spec"].get("workshop") or {}).get("objects")) or []
 
     for object_body in objects:
-        kind = object_body.kind
-        api_version = object_body.apiVersion
+        kind = object_body["kind"]
+        api_version = object_body["apiVersion"]
+
+        object_body = _substitute_variables(object_body)
 
         if not (api_version, kind) in namespaced_resources:
-            object_body.metadata.ownerReferences = [
+            object_body["metadata"]["ownerReferences"] = [
                 dict(
                     apiVersion="training.eduk8s.io/v1alpha1",
                     kind="Workshop",
@@ -207,8 +470,9 @@ def command_workshop_create(ctx, filename, name):
                 )
             ]
 
-        object_body = ResourceInstance(client, object_body).to_dict()
-        object_body = _substitute_variables(object_body)
+        object_body["metadata"]["labels"] = dict(
+            object_body["metadata"].get("labels") or {}, **workshop_labels
+        )
 
         resource = client.resources.get(api_version=api_version, kind=kind)
 
@@ -282,23 +546,101 @@ def command_workshop_enable(ctx, name):
 @group_workshop.command("delete")
 @click.pass_context
 @click.argument("name")
-def command_workshop_delete(ctx, name):
+@click.option(
+    "--fast",
+    is_flag=True,
+    help="Delete sessions and resources directly, not by garbage collection.",
+)
+@click.option(
+    "--wait", is_flag=True, help="Wait for the workshop and resources to be deleted.",
+)
+@click.option(
+    "--timeout", default=600, help="Seconds to wait for the workshop to be deleted.",
+)
+def command_workshop_delete(ctx, name, fast, wait, timeout):
     """
     Delete the custom resource describing a workshop.
     """
 
+    started = time.monotonic()
+
     client = kube.client()
 
     workshop_resource = _resource_type(
         ctx, client, "training.eduk8s.io/v1alpha1", "Workshop"
     )
 
+    # The whole workshop is only needed for a fast delete, to find the
+    # types of objects it creates, otherwise the metadata is enough to
+    # check it exists.
+
     try:
-        workshop_resource.delete(name=name)
-        click.echo(f"workshop.training.eduk8s.io/{name} deleted")
+        if fast:
+            workshop_body = kube.get_object(workshop_resource, name)
+        else:
+            kube.get_metadata(workshop_resource, name)
     except ApiException as e:
         ctx.fail(e.reason)
 
+    objects = [(workshop_resource, None, name)]
+
+    # With a fast delete, the sessions for the workshop and the namespaces
+    # and other cluster scoped objects owned by the workshop or sessions
+    # are all deleted directly and at the same time. Everything else is
+    # in the workshop namespace and goes when it is deleted.
+
+    if fast:
+        session_resource = _resource_type(
+            ctx, client, "training.eduk8s.io/v1alpha1", "Session"
+        )
+
+        sessions = kube.list_metadata(
+            session_resource, label_selector=f"workshop={name}"
+        )
+
+        uids = [workshop_body["metadata"]["uid"]]
+
+        for metadata in sessions:
+            objects.append((session_resource, None, metadata["name"]))
+            uids.append(metadata["uid"])
+
+        definitions = []
+
+        for section in ("workshop", "session"):
+            definitions.extend(
+                (workshop_body["spec"].get(section) or {}).get("objects") or []
+            )
+
+        types = teardown.cluster_scoped_types + tuple(
+            teardown.object_types(client, definitions)
+        )
+
+        objects.extend(
+            teardown.owned_objects(
+                client, uids, f"training.eduk8s.io/workshop={name}", types
+            )
+        )
+
+    if fast or not wait:
+        propagation_policy = "Background"
+    else:
+        propagation_policy = "Foreground"
+
+    failures = teardown.delete_objects(client, objects, propagation_policy)
+
+    if failures:
+        ctx.fail(getattr(failures[0][1], "reason", failures[0][1]))
+
+    click.echo(f"workshop.training.eduk8s.io/{name} deleted")
+
+    if wait:
+        if teardown.wait_for_deletion(
+            client, objects, timeout - (time.monotonic() - started)
+        ):
+            ctx.fail(f"Workshop '{name}' not deleted after {timeout} seconds.")
+
+        click.echo(f"Teardown completed in {time.monotonic() - started:.1f}s")
+
 
 @group_workshop.command("list")
 @click.pass_context
@@ -312,21 +654,461 @@ def command_workshop_list(ctx):
     workshop_resource = _resource_type(
         ctx, client, "training.eduk8s.io/v1alpha1", "Workshop"
     )
+    session_resource = _resource_type(
+        ctx, client, "training.eduk8s.io/v1alpha1", "Session"
+    )
+    deployment_resource = _resource_type(ctx, client, "apps/v1", "Deployment")
+
+    # Fetch the workshops, all sessions and the deployments for all
+    # sessions at the same time, then count them up by workshop, rather
+    # than querying the sessions for each workshop separately. These are
+    # listed in the server side table format so that only the columns
+    # needed are returned, rather than the whole of each object.
+
+    def _enabled(workshop):
+        return (workshop.get("status") or {}).get("enabled")
+
+    def _ready(deployment):
+        status = deployment.get("status") or {}
+        replicas = deployment["spec"].get("replicas", 1)
+        return f"{status.get('readyReplicas', 0)}/{replicas}"
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        workshops = executor.submit(
+            lambda: list(
+                kube.list_table(
+                    workshop_resource,
+                    {
+                        "Image": lambda workshop: workshop["spec"].get("image"),
+                        "Enabled": _enabled,
+                    },
+                )
+            )
+        )
+        sessions = executor.submit(
+            lambda: list(
+                kube.list_table(
+                    session_resource,
+                    {"Budget": lambda session: session["spec"].get("budget")},
+                    label_selector="workshop",
+                )
+            )
+        )
+        deployments = executor.submit(
+            lambda: list(
+                kube.list_table(
+                    deployment_resource,
+                    {"Ready": _ready},
+                    label_selector="training.eduk8s.io/session",
+                )
+            )
+        )
 
-    results = workshop_resource.get()
-
-    cols = [["NAME", "IMAGE", "ENABLED"]]
+    # What sessions have reserved is totalled the same way as sessions are
+    # charged when admitted against the capacity of the cluster.
+
+    session_budgets = {}
+
+    for session in sessions.result():
+        session_budgets.setdefault(
+            session["metadata"]["labels"]["workshop"], []
+        ).append(session["Budget"])
+
+    totals = {}
+
+    for workshop_name, workshop_budgets in session_budgets.items():
+        cpu, memory = budgets.committed_resources(workshop_budgets)
+        totals[workshop_name] = [len(workshop_budgets), 0, cpu, memory]
+
+    for deployment in deployments.result():
+        if not (deployment["Ready"] or "0/").startswith("0/"):
+            workshop_name = deployment["metadata"]["labels"].get(
+                "training.eduk8s.io/workshop"
+            )
+            if workshop_name in totals:
+                totals[workshop_name][1] += 1
+
+    cols = [
+        [
+            "NAME",
+            "IMAGE",
+            "ENABLED",
+            "SESSIONS",
+            "READY",
+            "RESERVED-CPU",
+            "RESERVED-MEM",
+        ]
+    ]
     data = []
 
-    for result in results.items:
-        if result.status and result.status.enabled:
+    for result in workshops.result():
+        if result["Enabled"]:
             enabled = "true"
         else:
             enabled = "false"
 
-        data.append((result.metadata.name, result.spec.image, enabled))
+        name = result["metadata"]["name"]
+
+        count, ready, cpu, memory = totals.get(name, [0, 0, 0, 0])
+
+        data.append(
+            (
+                name,
+                result["Image"],
+                enabled,
+                str(count),
+                str(ready),
+                quantity.format_quantity(cpu, "cpu"),
+                quantity.format_quantity(memory, "memory"),
+            )
+        )
 
     if data:
         click.echo("\n".join(_format_as_columns(cols, data)))
     else:
         click.echo("No workshops found.")
+
+
+@group_workshop.command("prepull")
+@click.pass_context
+@click.argument("name")
+@click.option(
+    "--pause-image",
+    default="k8s.gcr.io/pause:3.1",
+    help="Image for the container left running on each node.",
+)
+@click.option(
+    "--busybox-image",
+    default="busybox:1.31.1-musl",
+    help="Image with a statically linked /bin/busybox, run from each image.",
+)
+@click.option(
+    "--wait", is_flag=True, help="Wait for the images to be pulled on all nodes.",
+)
+@click.option(
+    "--timeout", default=1800, help="Seconds to wait for the images to be pulled.",
+)
+@click.option(
+    "--remove", is_flag=True, help="Remove the daemon set used to pull images.",
+)
+@click.option(
+    "--image-mirror",
+    multiple=True,
+    envvar="EDUK8S_IMAGE_MIRRORS",
+    help="Rewrite image prefix to use a registry mirror (PREFIX=REPLACEMENT).",
+)
+def command_workshop_prepull(
+    ctx, name, pause_image, busybox_image, wait, timeout, remove, image_mirror
+):
+    """
+    Pull the images for a workshop on to all nodes.
+    """
+
+    client = kube.client()
+
+    workshop_resource = _resource_type(
+        ctx, client, "training.eduk8s.io/v1alpha1", "Workshop"
+    )
+    daemon_set_resource = _resource_type(ctx, client, "apps/v1", "DaemonSet")
+
+    workshop_namespace = name
+
+    if remove:
+        try:
+            daemon_set_resource.delete(
+                namespace=workshop_namespace, name=f"{name}-prepull"
+            )
+            click.echo(f"daemonset.apps/{name}-prepull deleted")
+        except ApiException as e:
+            if e.status != 404:
+                ctx.fail(e.reason)
+            click.echo(f"daemonset.apps/{name}-prepull not found")
+        return
+
+    try:
+        workshop_body = kube.get_object(workshop_resource, name)
+    except ApiException as e:
+        if e.status == 404:
+            ctx.fail(f"Workshop with name '{name}' does not exist.")
+        raise
+
+    workshop_metadata = workshop_body["metadata"]
+
+    # Work out the set of images used by the workshop, as they would be
+    # rendered for a session. Images which are only known once variables
+    # are substituted for a session are skipped.
+
+    try:
+        mirrors = images.parse_mirrors(image_mirror)
+    except ValueError as e:
+        ctx.fail(str(e))
+
+    workshop_body = images.render_workshop(workshop_body, mirrors)
+
+    prepull_images = [workshop_body["spec"]["image"]]
+
+    session_body = workshop_body["spec"].get("session") or {}
+
+    prepull_images.extend(images.container_images(session_body.get("objects")))
+    prepull_images.extend(images.container_images(session_body.get("patches")))
+
+    prepull_images = [
+        image for image in dict.fromkeys(prepull_images) if "$(" not in image
+    ]
+
+    # Each image is pulled by running an init container which exits
+    # immediately. So this doesn't depend on what is in the image, as
+    # with distroless images which have no shell, the busybox binary is
+    # first copied into a shared volume and it is that which is run from
+    # each image. The binary must be statically linked, as the musl
+    # variant of the busybox image is, since the images need not provide
+    # any shared libraries. The images must also be for the same
+    # architecture as the node, which they would need to be anyway for
+    # sessions to run them. A pause container is then left running so
+    # the pod stays in place.
+
+    resources = {
+        "limits": {"cpu": "50m", "memory": "32Mi"},
+        "requests": {"cpu": "50m", "memory": "32Mi"},
+    }
+
+    init_containers = [
+        {
+            "name": "busybox",
+            "image": f"{busybox_image}",
+            "imagePullPolicy": "IfNotPresent",
+            "command": ["cp", "/bin/busybox", "/eduk8s-prepull/busybox"],
+            "volumeMounts": [{"name": "prepull", "mountPath": "/eduk8s-prepull"}],
+            "resources": resources,
+        }
+    ]
+
+    init_containers.extend(
+        {
+            "name": f"image-{index}",
+            "image": f"{image}",
+            "imagePullPolicy": "IfNotPresent",
+            "command": ["/eduk8s-prepull/busybox", "true"],
+            "volumeMounts": [
+                {"name": "prepull", "mountPath": "/eduk8s-prepull", "readOnly": True,}
+            ],
+            "resources": resources,
+        }
+        for index, image in enumerate(prepull_images)
+    )
+
+    daemon_set_body = {
+        "apiVersion": "apps/v1",
+        "kind": "DaemonSet",
+        "metadata": {
+            "name": f"{name}-prepull",
+            "labels": {"training.eduk8s.io/workshop": f"{name}"},
+            "ownerReferences": [
+                {
+                    "apiVersion": "training.eduk8s.io/v1alpha1",
+                    "kind": "Workshop",
+                    "blockOwnerDeletion": True,
+                    "controller": True,
+                    "name": f"{workshop_metadata['name']}",
+                    "uid": f"{workshop_metadata['uid']}",
+                }
+            ],
+        },
+        "spec": {
+            "selector": {"matchLabels": {"daemonset": f"{name}-prepull"}},
+            "template": {
+                "metadata": {
+                    "labels": {
+                        "training.eduk8s.io/workshop": f"{name}",
+                        "daemonset": f"{name}-prepull",
+                    }
+                },
+                "spec": {
+                    "initContainers": init_containers,
+                    "volumes": [{"name": "prepull", "emptyDir": {}}],
+                    "tolerations": [{"operator": "Exists"}],
+                    "containers": [
+                        {
+                            "name": "pause",
+                            "image": f"{pause_image}",
+                            "resources": {
+                                "limits": {"cpu": "10m", "memory": "16Mi"},
+                                "requests": {"cpu": "10m", "memory": "16Mi"},
+                            },
+                        }
+                    ],
+                },
+            },
+        },
+    }
+
+    try:
+        daemon_set_resource.create(namespace=workshop_namespace, body=daemon_set_body)
+        click.echo(f"daemonset.apps/{name}-prepull created")
+    except ApiException as e:
+        if e.status != 409:
+            raise
+        daemon_set_resource.patch(
+            namespace=workshop_namespace,
+            body=daemon_set_body,
+            content_type="application/merge-patch+json",
+        )
+        click.echo(f"daemonset.apps/{name}-prepull updated")
+
+    if not wait:
+        return
+
+    # Wait for the daemon set to be rolled out with the current set of
+    # images on all nodes it is scheduled to.
+
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        remaining = max(1, int(deadline - time.monotonic()))
+
+        for event in daemon_set_resource.watch(
+            namespace=workshop_namespace,
+            field_selector=f"metadata.name={name}-prepull",
+            timeout=remaining,
+        ):
+            daemon_set = event["raw_object"]
+            status = daemon_set.get("status", {})
+
+            desired = status.get("desiredNumberScheduled", 0)
+
+            if (
+                status.get("observedGeneration", 0)
+                >= daemon_set["metadata"].get("generation", 0)
+                and status.get("updatedNumberScheduled", 0) >= desired
+                and status.get("numberReady", 0) >= desired
+            ):
+                click.echo(f"Images pulled on {desired} nodes.")
+                return
+
+            if time.monotonic() >= deadline:
+                break
+
+    ctx.fail(f"Images not pulled on all nodes after {timeout} seconds.")
+
+
+@group_workshop.command("migrate-rbac")
+@click.pass_context
+@click.argument("name")
+def command_workshop_migrate_rbac(ctx, name):
+    """
+    Grant console access per workshop instead of per session.
+    """
+
+    client = kube.client()
+
+    workshop_resource = _resource_type(
+        ctx, client, "training.eduk8s.io/v1alpha1", "Workshop"
+    )
+    session_resource = _resource_type(
+        ctx, client, "training.eduk8s.io/v1alpha1", "Session"
+    )
+    cluster_role_binding_resource = _resource_type(
+        ctx, client, "rbac.authorization.k8s.io/v1", "ClusterRoleBinding"
+    )
+
+    try:
+        workshop_metadata = kube.get_metadata(workshop_resource, name)
+    except ApiException as e:
+        if e.status == 404:
+            ctx.fail(f"Workshop with name '{name}' does not exist.")
+        raise
+
+    workshop_namespace = name
+
+    sessions = list(
+        kube.list_metadata(session_resource, label_selector=f"workshop={name}")
+    )
+
+    # Create the binding for the workshop, with the service accounts of
+    # the existing sessions as subjects, before removing the bindings for
+    # the sessions, so that existing sessions never lose console access.
+
+    subjects = [
+        rbac.session_subject(workshop_namespace, metadata["name"][len(name) + 1 :])
+        for metadata in sessions
+    ]
+
+    try:
+        cluster_role_binding_resource.create(
+            body=rbac.console_binding_body(
+                name, workshop_metadata["uid"], workshop_namespace, subjects
+            )
+        )
+        click.echo(
+            "clusterrolebinding.rbac.authorization.k8s.io/"
+            f"{workshop_namespace}-console created"
+        )
+    except ApiException as e:
+        if e.status != 409:
+            raise
+        if rbac.update_subjects(
+            cluster_role_binding_resource, f"{workshop_namespace}-console", subjects
+        ):
+            click.echo(
+                "clusterrolebinding.rbac.authorization.k8s.io/"
+                f"{workshop_namespace}-console updated"
+            )
+
+    workshop_body = {
+        "kind": "Workshop",
+        "apiVersion": "training.eduk8s.io/v1alpha1",
+        "metadata": {"name": name},
+        "spec": {"session": {"consoleBinding": "workshop"}},
+    }
+
+    workshop_resource.patch(
+        body=workshop_body, content_type="application/merge-patch+json"
+    )
+
+    click.echo(f"workshop.training.eduk8s.io/{name} updated")
+
+    # Delete the cluster role bindings for the existing sessions.
+
+    async def _delete_bindings(api):
+        async def _delete_binding(metadata):
+            try:
+                await api.delete(
+                    cluster_role_binding_resource, f"{metadata['name']}-console"
+                )
+            except ApiException as e:
+                if e.status != 404:
+                    raise
+                return False
+            return True
+
+        return await aio.fan_out(_delete_binding, sessions)
+
+    deleted = 0
+
+    for _, result, error in aio.run(client, _delete_bindings):
+        if error is not None:
+            raise error
+        deleted += result
+
+    click.echo(f"Deleted {deleted} session cluster role bindings.")
+
+
+@group_workshop.command("router")
+@click.pass_context
+@click.argument("name")
+@click.option(
+    "--domain", required=True, help="Domain name under which sessions are hosted.",
+)
+@click.option(
+    "--port", default=8080, help="Port to listen on for requests.",
+)
+def command_workshop_router(ctx, name, domain, port):
+    """
+    Route requests to workshop sessions through a shared ingress.
+    """
+
+    logging.basicConfig(level=logging.INFO)
+
+    client = kube.client()
+
+    router.serve(client, name, domain, port)
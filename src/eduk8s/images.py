@@ -0,0 +1,184 @@
+import copy
+import functools
+
+
+def parse_mirrors(values):
+    # Mirrors are given as "prefix=replacement" pairs, for example
+    # "quay.io/=mirror.local/quay/". They are returned ordered so the
+    # longest matching prefix is tried first.
+
+    mirrors = []
+
+    for value in values or []:
+        for item in value.split():
+            if "=" not in item:
+                raise ValueError(f"Invalid image mirror '{item}'.")
+            prefix, replacement = item.split("=", 1)
+            mirrors.append((prefix, replacement))
+
+    return tuple(sorted(mirrors, key=lambda mirror: len(mirror[0]), reverse=True))
+
+
+def _normalize_image(image):
+    # Images without a registry host are pulled from Docker Hub, with
+    # single component names also being in the "library" namespace.
+
+    parts = image.split("/", 1)
+
+    if len(parts) == 1:
+        return f"docker.io/library/{image}"
+
+    if "." not in parts[0] and ":" not in parts[0] and parts[0] != "localhost":
+        return f"docker.io/{image}"
+
+    return image
+
+
+def rewrite_image(image, mirrors):
+    if not image or not mirrors:
+        return image
+
+    # Images already using a mirror are left alone, as where a workshop
+    # was created with mirrors its images will have been rewritten.
+
+    if any(image.startswith(replacement) for _, replacement in mirrors):
+        return image
+
+    for candidate in dict.fromkeys((image, _normalize_image(image))):
+        for prefix, replacement in mirrors:
+            if candidate.startswith(prefix):
+                return replacement + candidate[len(prefix) :]
+
+    return image
+
+
+def _image_reference(image):
+    # Nodes report the images they hold by name and tag, and by digest.
+    # Names are normalized and given a tag if they don't have one so
+    # that they can be compared.
+
+    image = _normalize_image(image)
+
+    if "@" not in image and ":" not in image.rsplit("/", 1)[-1]:
+        image = f"{image}:latest"
+
+    return image
+
+
+def nodes_with_image(nodes, image):
+    # Return the names of nodes which report already holding the image.
+
+    image = _image_reference(image)
+
+    matches = []
+
+    for node in nodes:
+        spec = node.get("spec") or {}
+
+        if spec.get("unschedulable"):
+            continue
+
+        for item in (node.get("status") or {}).get("images") or []:
+            names = item.get("names") or []
+            if image in (_image_reference(name) for name in names):
+                matches.append(node["metadata"]["name"])
+                break
+
+    return matches
+
+
+def container_images(obj):
+    # Find the images of any containers in a resource definition, or
+    # in patches for a pod template, no matter how deeply nested.
+
+    images = []
+
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if key in ("containers", "initContainers") and isinstance(value, list):
+                for container in value:
+                    if isinstance(container, dict) and container.get("image"):
+                        images.append(container["image"])
+            images.extend(container_images(value))
+    elif isinstance(obj, list):
+        for item in obj:
+            images.extend(container_images(item))
+
+    return images
+
+
+def rewrite_images(obj, mirrors):
+    # Return a copy of the resource definition with the images of any
+    # containers rewritten to use the registry mirrors.
+
+    if isinstance(obj, dict):
+        result = {}
+        for key, value in obj.items():
+            if key in ("containers", "initContainers") and isinstance(value, list):
+                value = [
+                    dict(container, image=rewrite_image(container["image"], mirrors))
+                    if isinstance(container, dict) and container.get("image")
+                    else container
+                    for container in value
+                ]
+            result[key] = rewrite_images(value, mirrors)
+        return result
+    elif isinstance(obj, list):
+        return [rewrite_images(item, mirrors) for item in obj]
+    else:
+        return obj
+
+
+def rewrite_workshop(workshop, mirrors):
+    # Rewrite the workshop image and the images of containers in the
+    # workshop and session objects, and the session patches.
+
+    workshop = copy.deepcopy(workshop)
+
+    if not mirrors:
+        return workshop
+
+    spec = workshop.setdefault("spec", {})
+
+    if spec.get("image"):
+        spec["image"] = rewrite_image(spec["image"], mirrors)
+
+    for section in ("workshop", "session"):
+        if spec.get(section):
+            spec[section] = rewrite_images(spec[section], mirrors)
+
+    return workshop
+
+
+class _WorkshopVersion:
+    # Stands in for a workshop as a cache key, comparing equal for any
+    # copy of the same version of the workshop.
+
+    def __init__(self, workshop):
+        metadata = workshop.get("metadata", {})
+        self.workshop = workshop
+        self.key = (metadata.get("uid"), metadata.get("resourceVersion"))
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+@functools.lru_cache(maxsize=32)
+def _render_workshop(version, mirrors):
+    return rewrite_workshop(version.workshop, mirrors)
+
+
+def render_workshop(workshop, mirrors):
+    # Cache the rewritten workshop against the version of the workshop
+    # and the mirrors so that it is only rendered once when creating
+    # many sessions. The cached copy must not be modified by callers.
+
+    version = _WorkshopVersion(workshop)
+
+    if None in version.key:
+        return rewrite_workshop(workshop, mirrors)
+
+    return _render_workshop(version, mirrors)
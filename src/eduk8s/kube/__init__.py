@@ -1,22 +1,324 @@
 import os
+import re
+import json
+import threading
 
-from kubernetes.config import new_client_from_config
+from kubernetes.config import load_kube_config
 from kubernetes.config.incluster_config import load_incluster_config
-from kubernetes.client.api_client import ApiClient
+from kubernetes.client import Configuration
+from kubernetes.client.rest import ApiException
 
 from openshift.dynamic import DynamicClient
 
+from .transport import RetryingApiClient, Counters
+
 kubernetes_service_host = os.environ.get("KUBERNETES_SERVICE_HOST")
 kubernetes_service_port = os.environ.get("KUBERNETES_SERVICE_PORT")
 
+_clients = {}
+_clients_lock = threading.Lock()
+
+_whitespace = re.compile(r"[ \t\n\r]*")
+
+# Responses to requests for lists can be large, so ask for them to be
+# compressed. The API server only compresses larger responses, and they
+# are decompressed automatically when read.
 
-def client():
-    if kubernetes_service_host and kubernetes_service_port:
+_compressed = {"Accept-Encoding": "gzip"}
+
+
+def _configuration(context):
+    if context is None and kubernetes_service_host and kubernetes_service_port:
         load_incluster_config()
-        k8s_client = ApiClient()
-        dyn_client = DynamicClient(k8s_client)
+        configuration = Configuration()
     else:
-        k8s_client = new_client_from_config()
-        dyn_client = DynamicClient(k8s_client)
+        configuration = type.__call__(Configuration)
+        load_kube_config(context=context, client_configuration=configuration)
+
+    # Allow enough pooled connections for concurrent bulk operations.
+
+    configuration.connection_pool_maxsize = max(
+        configuration.connection_pool_maxsize, 64
+    )
+
+    return configuration
+
+
+def client(context=None):
+    # A client is created once for each kubeconfig context and is then
+    # shared, so connections and API discovery are reused. When no
+    # context is given, the in cluster config or current context is used.
+
+    with _clients_lock:
+        if context not in _clients:
+            k8s_client = RetryingApiClient(configuration=_configuration(context))
+            _clients[context] = DynamicClient(k8s_client)
+
+        return _clients[context]
+
+
+def counters():
+    # Totals for the requests made by all clients, covering throttling by
+    # the API server and retries of failed requests.
+
+    totals = dict.fromkeys(Counters.fields, 0)
+
+    with _clients_lock:
+        clients = list(_clients.values())
+
+    for dynamic_client in clients:
+        for field, value in dynamic_client.client.counters.snapshot().items():
+            totals[field] += value
+
+    return totals
+
+
+def _skip_whitespace(text, index):
+    return _whitespace.match(text, index).end()
+
+
+def _decode_list(text, fields):
+    # Decode the JSON for a list of objects, yielding each item as it is
+    # decoded rather than building the list of all items first. The other
+    # top level fields, such as the metadata, are added to the dict given.
+
+    decoder = json.JSONDecoder()
+
+    index = _skip_whitespace(text, 0)
+
+    if text[index : index + 1] != "{":
+        raise ValueError("Expected JSON object for list.")
+
+    index = _skip_whitespace(text, index + 1)
+
+    while text[index] != "}":
+        key, index = decoder.raw_decode(text, index)
+        index = _skip_whitespace(text, index)
+
+        if text[index] != ":":
+            raise ValueError("Expected ':' in JSON object.")
+
+        index = _skip_whitespace(text, index + 1)
+
+        if key == "items" and text[index] == "[":
+            index = _skip_whitespace(text, index + 1)
+
+            while text[index] != "]":
+                item, index = decoder.raw_decode(text, index)
+                yield item
+                index = _skip_whitespace(text, index)
+                if text[index] == ",":
+                    index = _skip_whitespace(text, index + 1)
+
+            index += 1
+        else:
+            fields[key], index = decoder.raw_decode(text, index)
+
+        index = _skip_whitespace(text, index)
+
+        if text[index] == ",":
+            index = _skip_whitespace(text, index + 1)
+
+
+def _response_data(resource, response):
+    # Read the body of a response, counting the bytes received, which may
+    # be compressed, against what they decoded to.
+
+    data = response.data
+
+    counters = getattr(getattr(resource.client, "client", None), "counters", None)
+
+    if counters is not None:
+        tell = getattr(response, "tell", None)
+        counters.add("received", tell() if tell else len(data))
+        counters.add("decoded", len(data))
+
+    return data
+
+
+def get_object(resource, name=None, namespace=None, **kwargs):
+    # Get an object, or a list of objects when no name is given, as plain
+    # dicts decoded straight from the response. This avoids the cost of
+    # wrapping every field of the response as a resource field.
+
+    response = resource.get(
+        name=name,
+        namespace=namespace,
+        serialize=False,
+        header_params=dict(_compressed),
+        **kwargs,
+    )
+
+    return json.loads(_response_data(resource, response))
+
+
+def list_items(
+    resource, namespace=None, label_selector=None, limit=500, incremental=True
+):
+    # List the objects of a resource type in pages, so a large list is
+    # not returned by the API server all at once, yielding each object.
+    # Items are decoded one at a time when incremental, so that only the
+    # text of the response and the items still in use are held at once.
+
+    token = None
+
+    while True:
+        response = resource.get(
+            namespace=namespace,
+            label_selector=label_selector,
+            limit=limit,
+            _continue=token,
+            serialize=False,
+            header_params=dict(_compressed),
+        )
+
+        if incremental:
+            fields = {}
+            text = _response_data(resource, response).decode("utf-8")
+            yield from _decode_list(text, fields)
+        else:
+            fields = json.loads(_response_data(resource, response))
+            yield from fields.pop("items", None) or []
+
+        token = (fields.get("metadata") or {}).get("continue")
+
+        if not token:
+            break
+
+
+def _accept(kind):
+    # Ask for the object or list in the form of the meta.k8s.io kind given,
+    # accepting the same from older API servers, falling back to JSON for
+    # the whole object where the API server doesn't support the kind.
+
+    return ",".join(
+        [
+            f"application/json;as={kind};v=v1;g=meta.k8s.io",
+            f"application/json;as={kind};v=v1beta1;g=meta.k8s.io",
+            "application/json",
+        ]
+    )
+
+
+_table_accept = _accept("Table")
+
+_metadata_accept = _accept("PartialObjectMetadata")
+
+_metadata_list_accept = _accept("PartialObjectMetadataList")
+
+
+def _request(resource, path, query_params, accept):
+    # Make a GET request for the path, returning the decoded response and
+    # the content type which was accepted. Where the API server rejects the
+    # content types asked for, it is asked for plain JSON instead.
+
+    api_client = resource.client.client
+
+    while True:
+        try:
+            response = api_client.call_api(
+                path,
+                "GET",
+                query_params=query_params,
+                header_params=dict(_compressed, Accept=accept),
+                auth_settings=["BearerToken"],
+                _preload_content=False,
+                _return_http_data_only=True,
+            )
+        except ApiException as e:
+            if e.status == 406 and accept != "application/json":
+                accept = "application/json"
+                continue
+            raise
+
+        return json.loads(_response_data(resource, response)), accept
+
+
+def list_table(resource, columns, namespace=None, label_selector=None, limit=500):
+    # List objects in the server side table format, so only the columns
+    # the API server would display and the metadata of each object are
+    # returned, rather than the whole of each object. Each row is yielded
+    # as a dict of the column values plus the metadata. The columns are
+    # given as a dict of the column names against functions to extract
+    # the same value from a whole object, which are used if the API
+    # server can't provide a table, or it doesn't have all the columns.
+
+    path = resource.path(namespace=namespace)
+
+    accept = _table_accept
+    token = None
+
+    while True:
+        query_params = [("includeObject", "Metadata"), ("limit", limit)]
+
+        if label_selector:
+            query_params.append(("labelSelector", label_selector))
+        if token:
+            query_params.append(("continue", token))
+
+        result, accept = _request(resource, path, query_params, accept)
+
+        if result.get("kind") == "Table":
+            names = [column["name"] for column in result["columnDefinitions"]]
+
+            if token is None and not set(columns).issubset(names):
+                accept = "application/json"
+                continue
+
+            for row in result.get("rows") or []:
+                values = dict(zip(names, row["cells"]))
+                values = {name: values.get(name) for name in columns}
+                values["metadata"] = (row.get("object") or {}).get("metadata") or {}
+                yield values
+
+        else:
+            for item in result.get("items") or []:
+                values = {name: function(item) for name, function in columns.items()}
+                values["metadata"] = item.get("metadata") or {}
+                yield values
+
+        token = (result.get("metadata") or {}).get("continue")
+
+        if not token:
+            break
+
+
+def get_metadata(resource, name, namespace=None):
+    # Get only the metadata of an object, for when just the name, labels,
+    # owner references or resource version of it are needed. Raises the
+    # API exception as for a full get when the object doesn't exist.
+
+    path = f"{resource.path(namespace=namespace)}/{name}"
+
+    result, _ = _request(resource, path, [], _metadata_accept)
+
+    return result.get("metadata") or {}
+
+
+def list_metadata(resource, namespace=None, label_selector=None, limit=500):
+    # List objects in pages as for list_items, but yield only the metadata
+    # of each object. Where the API server can only return whole objects,
+    # the metadata is picked out of those instead.
+
+    path = resource.path(namespace=namespace)
+
+    accept = _metadata_list_accept
+    token = None
+
+    while True:
+        query_params = [("limit", limit)]
+
+        if label_selector:
+            query_params.append(("labelSelector", label_selector))
+        if token:
+            query_params.append(("continue", token))
+
+        result, accept = _request(resource, path, query_params, accept)
+
+        for item in result.get("items") or []:
+            yield item.get("metadata") or {}
+
+        token = (result.get("metadata") or {}).get("continue")
 
-    return dyn_client
+        if not token:
+            break
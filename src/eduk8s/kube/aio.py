@@ -0,0 +1,580 @@
+import os
+import ssl
+import gzip
+import json
+import time
+import asyncio
+import logging
+
+from urllib.parse import urlsplit, unquote
+
+import aiohttp
+
+from kubernetes.client.rest import ApiException
+from openshift.dynamic.exceptions import ResourceNotFoundError
+
+from . import transport
+from .. import metrics
+from . import _metadata_accept, _metadata_list_accept
+
+logger = logging.getLogger("eduk8s.kube")
+
+# Resource types found by discovery, by the API server and API version.
+# These are shared by all clients, as what an API server supports isn't
+# going to change while a command runs.
+
+_discovery = {}
+
+
+class ResourceType:
+    # The details of a type of resource needed to make requests for it.
+    # Paths are formed the same as for the resources of the dynamic
+    # client, so objects found with either can be used with the other.
+
+    def __init__(self, api_version, kind, name, namespaced):
+        self.api_version = api_version
+        self.kind = kind
+        self.name = name
+        self.namespaced = namespaced
+
+    @property
+    def prefix(self):
+        if "/" in self.api_version:
+            return f"/apis/{self.api_version}"
+        return f"/api/{self.api_version}"
+
+    def path(self, name=None, namespace=None):
+        path = self.prefix
+
+        if namespace and self.namespaced:
+            path = f"{path}/namespaces/{namespace}"
+
+        path = f"{path}/{self.name}"
+
+        if name:
+            path = f"{path}/{name}"
+
+        return path
+
+
+def _ssl_context(configuration):
+    context = ssl.create_default_context(cafile=configuration.ssl_ca_cert)
+
+    if not configuration.verify_ssl:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif configuration.assert_hostname is False:
+        context.check_hostname = False
+
+    if configuration.cert_file:
+        context.load_cert_chain(configuration.cert_file, configuration.key_file)
+
+    return context
+
+
+def _api_exception(status, reason, headers, data):
+    error = ApiException(status=status, reason=reason)
+    error.headers = headers
+    error.body = data.decode("utf-8", "replace")
+    return error
+
+
+async def _timed(awaitable, timeout):
+    # Wait for something to complete, raising a timeout error if it takes
+    # longer than the timeout. A timeout of zero or None means no limit.
+
+    if not timeout:
+        return await awaitable
+
+    return await asyncio.wait_for(awaitable, timeout)
+
+
+class Client:
+    # Client for the Kubernetes REST API made using aiohttp, so many
+    # requests can be in flight at once on one event loop rather than each
+    # needing a thread. Connections are pooled and reused, with a limit on
+    # how many are opened to the API server, beyond which requests wait
+    # for a connection to be free. The number of requests in flight is
+    # bounded, the rate of requests is limited and failed requests are
+    # retried, the same as for the synchronous client. The client must be
+    # created, used and closed within the one event loop.
+
+    def __init__(
+        self,
+        configuration,
+        counters=None,
+        limiter=None,
+        concurrency=None,
+        connections=None,
+        qps=None,
+        burst=None,
+        retries=None,
+        connect_timeout=None,
+        read_timeout=None,
+    ):
+        self.base = configuration.host.rstrip("/")
+        self.authority = urlsplit(configuration.host).netloc
+
+        # Basic authentication from a kubeconfig is already given as the
+        # authorization key, but may also have been set directly.
+
+        self.headers = {}
+
+        authorization = configuration.get_api_key_with_prefix("authorization")
+
+        if not authorization and configuration.username:
+            authorization = aiohttp.BasicAuth(
+                configuration.username, configuration.password or ""
+            ).encode()
+
+        if authorization:
+            self.headers["Authorization"] = authorization
+
+        # Requests are sent through the proxy, if there is one, with aiohttp
+        # having it tunnel a connection through to the API server.
+
+        self.proxy = None
+        self.proxy_auth = None
+
+        if configuration.proxy:
+            proxy = urlsplit(configuration.proxy)
+            self.proxy = f"{proxy.scheme}://{proxy.hostname}:{proxy.port or 80}"
+            if proxy.username:
+                self.proxy_auth = aiohttp.BasicAuth(
+                    unquote(proxy.username), unquote(proxy.password or "")
+                )
+
+        qps, burst, retries = transport.settings(qps, burst, retries)
+
+        if concurrency is None:
+            concurrency = int(os.environ.get("EDUK8S_CONCURRENCY", "256"))
+        if connections is None:
+            connections = int(os.environ.get("EDUK8S_CONNECTIONS", "32"))
+
+        # Time limits, in seconds, on opening a connection and on waiting
+        # for the API server to respond, so a request to an API server
+        # which has stopped responding fails rather than hanging.
+
+        if connect_timeout is None:
+            connect_timeout = float(os.environ.get("EDUK8S_CONNECT_TIMEOUT", "10"))
+        if read_timeout is None:
+            read_timeout = float(os.environ.get("EDUK8S_READ_TIMEOUT", "60"))
+
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        connector_options = {}
+
+        if urlsplit(configuration.host).scheme == "https":
+            connector_options["ssl"] = _ssl_context(configuration)
+
+        # Responses are decompressed here rather than by aiohttp, so the
+        # bytes received can be counted against what they decoded to.
+
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=0, limit_per_host=connections, **connector_options
+            ),
+            timeout=aiohttp.ClientTimeout(
+                total=None, sock_connect=connect_timeout, sock_read=read_timeout
+            ),
+            auto_decompress=False,
+        )
+
+        # A watch holds its connection for as long as it lasts, so watches
+        # have connections of their own. Were they to count against the
+        # limit on connections, enough watches at once would stop any
+        # other request being made.
+
+        self.watch_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0, **connector_options),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout),
+        )
+
+        self.limiter = limiter or transport.TokenBucket(qps, burst)
+        self.retries = retries
+        self.backoff = 0.5
+        self.max_backoff = 30.0
+        self.counters = counters or transport.Counters()
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    @classmethod
+    def for_client(cls, client, **kwargs):
+        # Create a client for the same API server as a dynamic client,
+        # sharing the limit on the rate of requests and the counters.
+
+        api_client = client.client
+
+        kwargs.setdefault("counters", getattr(api_client, "counters", None))
+        kwargs.setdefault("limiter", getattr(api_client, "limiter", None))
+
+        return cls(api_client.configuration, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        await self.session.close()
+        await self.watch_session.close()
+
+    async def _exchange(self, method, path, query, headers, data):
+        async with self.session.request(
+            method,
+            self.base + path,
+            params=query,
+            data=data,
+            headers=headers,
+            proxy=self.proxy,
+            proxy_auth=self.proxy_auth,
+        ) as response:
+            body = await response.read()
+            return response.status, response.reason, response.headers, body
+
+    async def request(
+        self, method, path, query=None, body=None, content_type=None, accept=None
+    ):
+        # Make a request and return the decoded response, raising an API
+        # exception for an error response the same as the dynamic client.
+
+        headers = dict(self.headers)
+
+        headers["Accept"] = accept or "application/json"
+        headers["Accept-Encoding"] = "gzip"
+
+        data = None
+
+        if body is not None:
+            headers["Content-Type"] = content_type or "application/json"
+            data = json.dumps(body).encode("utf-8")
+
+        attempt = 0
+
+        while True:
+            delay = self.limiter.reserve()
+
+            self.counters.add("waited", delay)
+            self.counters.add("requests")
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                async with self.semaphore:
+                    started = time.monotonic()
+
+                    try:
+                        exchange = await self._exchange(
+                            method, path, query, headers, data
+                        )
+                    finally:
+                        metrics.observe(
+                            "eduk8s_api_request_duration_seconds",
+                            time.monotonic() - started,
+                            {"verb": method},
+                        )
+
+                status, reason, response_headers, received = exchange
+
+                if response_headers.get("Content-Encoding", "").lower() == "gzip":
+                    decoded = gzip.decompress(received)
+                else:
+                    decoded = received
+
+                self.counters.add("received", len(received))
+                self.counters.add("decoded", len(decoded))
+
+                if status >= 400:
+                    raise _api_exception(status, reason, response_headers, decoded)
+
+                return json.loads(decoded) if decoded else None
+
+            except (
+                ApiException,
+                aiohttp.ClientError,
+                OSError,
+                asyncio.TimeoutError,
+            ) as error:
+                if isinstance(error, ApiException) and error.status == 429:
+                    self.counters.add("throttled")
+
+                if not transport.retryable(method, error):
+                    raise
+
+                if attempt >= self.retries:
+                    self.counters.add("failures")
+                    raise
+
+                delay = transport.retry_delay(
+                    attempt, error, self.backoff, self.max_backoff
+                )
+
+                attempt += 1
+
+                logger.debug(
+                    "Retrying %s %s in %.2f seconds after %s.",
+                    method,
+                    path,
+                    delay,
+                    getattr(error, "status", None) or type(error).__name__,
+                )
+
+                self.counters.add("retries")
+                self.counters.add("waited", delay)
+
+                await asyncio.sleep(delay)
+
+    async def resource(self, api_version, kind):
+        # Find a type of resource, using discovery on the API version the
+        # first time any type in it is needed.
+
+        key = (self.authority, api_version)
+
+        resources = _discovery.get(key)
+
+        if resources is None:
+            resource_type = ResourceType(api_version, None, None, False)
+            result = await self.request("GET", resource_type.prefix)
+
+            resources = {
+                item["kind"]: ResourceType(
+                    api_version, item["kind"], item["name"], item["namespaced"]
+                )
+                for item in result.get("resources") or []
+                if "/" not in item["name"]
+            }
+
+            _discovery[key] = resources
+
+        try:
+            return resources[kind]
+        except KeyError:
+            raise ResourceNotFoundError(
+                f"No matches found for {{'api_version': '{api_version}', "
+                f"'kind': '{kind}'}}"
+            )
+
+    # The resource given to the following can be either a resource type
+    # found by discovery by this client, or a resource of a dynamic client.
+
+    async def get(self, resource, name, namespace=None):
+        return await self.request("GET", resource.path(name=name, namespace=namespace))
+
+    async def get_metadata(self, resource, name, namespace=None):
+        path = resource.path(name=name, namespace=namespace)
+
+        try:
+            result = await self.request("GET", path, accept=_metadata_accept)
+        except ApiException as e:
+            if e.status != 406:
+                raise
+            result = await self.request("GET", path)
+
+        return result.get("metadata") or {}
+
+    async def list(
+        self, resource, namespace=None, label_selector=None, limit=500, accept=None
+    ):
+        # List the objects of a resource type in pages, yielding each one.
+
+        path = resource.path(namespace=namespace)
+
+        token = None
+
+        while True:
+            query = [("limit", limit)]
+
+            if label_selector:
+                query.append(("labelSelector", label_selector))
+            if token:
+                query.append(("continue", token))
+
+            result = await self.request("GET", path, query, accept=accept)
+
+            for item in result.get("items") or []:
+                yield item
+
+            token = (result.get("metadata") or {}).get("continue")
+
+            if not token:
+                break
+
+    async def list_metadata(self, resource, namespace=None, label_selector=None):
+        # List only the metadata of objects, falling back to the whole
+        # objects where the API server doesn't support doing that.
+
+        accept = _metadata_list_accept
+
+        try:
+            async for item in self.list(
+                resource, namespace, label_selector, accept=accept
+            ):
+                yield item.get("metadata") or {}
+        except ApiException as e:
+            if e.status != 406:
+                raise
+            async for item in self.list(resource, namespace, label_selector):
+                yield item.get("metadata") or {}
+
+    async def create(self, resource, body, namespace=None):
+        return await self.request("POST", resource.path(namespace=namespace), body=body)
+
+    async def patch(
+        self,
+        resource,
+        name,
+        body,
+        namespace=None,
+        content_type="application/merge-patch+json",
+    ):
+        return await self.request(
+            "PATCH",
+            resource.path(name=name, namespace=namespace),
+            body=body,
+            content_type=content_type,
+        )
+
+    async def delete(self, resource, name, namespace=None, propagation_policy=None):
+        body = None
+
+        if propagation_policy:
+            body = {
+                "apiVersion": "v1",
+                "kind": "DeleteOptions",
+                "propagationPolicy": propagation_policy,
+            }
+
+        return await self.request(
+            "DELETE", resource.path(name=name, namespace=namespace), body=body
+        )
+
+    async def watch(
+        self,
+        resource,
+        namespace=None,
+        field_selector=None,
+        label_selector=None,
+        resource_version=None,
+        timeout=None,
+    ):
+        # Watch for changes to objects, yielding each event. A watch has a
+        # connection of its own, which is closed when the watch ends. It
+        # only counts against the requests in flight until the API server
+        # responds, so long running watches don't hold up other requests.
+
+        query = [("watch", "true")]
+
+        if field_selector:
+            query.append(("fieldSelector", field_selector))
+        if label_selector:
+            query.append(("labelSelector", label_selector))
+        if resource_version:
+            query.append(("resourceVersion", resource_version))
+        if timeout:
+            query.append(("timeoutSeconds", timeout))
+
+        url = self.base + resource.path(namespace=namespace)
+
+        # There may be no events for as long as the watch lasts, so only
+        # give up on the API server if it goes beyond the watch timeout.
+
+        idle_timeout = timeout and self.read_timeout and timeout + self.read_timeout
+
+        delay = self.limiter.reserve()
+
+        self.counters.add("waited", delay)
+        self.counters.add("requests")
+
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        started = time.monotonic()
+
+        try:
+            async with self.semaphore:
+                response = await _timed(
+                    self.watch_session.get(
+                        url,
+                        params=query,
+                        headers=dict(self.headers, Accept="application/json"),
+                        proxy=self.proxy,
+                        proxy_auth=self.proxy_auth,
+                        timeout=aiohttp.ClientTimeout(
+                            total=None,
+                            sock_connect=self.connect_timeout,
+                            sock_read=idle_timeout or None,
+                        ),
+                    ),
+                    self.read_timeout,
+                )
+
+                if response.status >= 400:
+                    try:
+                        body = await _timed(response.read(), self.read_timeout)
+                    finally:
+                        response.release()
+                    raise _api_exception(
+                        response.status, response.reason, response.headers, body
+                    )
+
+        except BaseException:
+            metrics.observe(
+                "eduk8s_api_request_duration_seconds",
+                time.monotonic() - started,
+                {"verb": "WATCH"},
+            )
+            raise
+
+        # Events are split out of the data as it arrives, rather than read
+        # a line at a time, as an event for a large object can be longer
+        # than aiohttp allows for a line.
+
+        try:
+            buffer = b""
+
+            async for chunk in response.content.iter_any():
+                buffer += chunk
+
+                *lines, buffer = buffer.split(b"\n")
+
+                for line in lines:
+                    if line.strip():
+                        yield json.loads(line)
+
+        finally:
+            response.close()
+
+            metrics.observe(
+                "eduk8s_api_request_duration_seconds",
+                time.monotonic() - started,
+                {"verb": "WATCH"},
+            )
+
+
+async def fan_out(function, items):
+    # Call the coroutine function for each item concurrently, returning
+    # the item, result and any exception raised for each, in order.
+
+    items = list(items)
+
+    async def _call(item):
+        try:
+            return (item, await function(item), None)
+        except Exception as e:
+            return (item, None, e)
+
+    return list(await asyncio.gather(*[_call(item) for item in items]))
+
+
+def run(client, function, *args, **kwargs):
+    # Run a coroutine function from synchronous code, passing it an async
+    # client for the same API server as the dynamic client given. This is
+    # how the commands use the async client, so they stay synchronous.
+
+    async def _main():
+        async with Client.for_client(client) as api:
+            return await function(api, *args, **kwargs)
+
+    return asyncio.run(_main())
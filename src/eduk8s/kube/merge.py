@@ -0,0 +1,140 @@
+_directive = "$patch"
+
+# The keys which identify the items of lists in a pod template, by the
+# path of field names to the list. These are the merge keys Kubernetes
+# uses for a strategic merge patch of the same fields.
+
+pod_template_merge_keys = {
+    ("spec", "containers"): "name",
+    ("spec", "containers", "env"): "name",
+    ("spec", "containers", "ports"): "containerPort",
+    ("spec", "containers", "volumeMounts"): "mountPath",
+    ("spec", "containers", "volumeDevices"): "devicePath",
+    ("spec", "initContainers"): "name",
+    ("spec", "initContainers", "env"): "name",
+    ("spec", "initContainers", "ports"): "containerPort",
+    ("spec", "initContainers", "volumeMounts"): "mountPath",
+    ("spec", "initContainers", "volumeDevices"): "devicePath",
+    ("spec", "volumes"): "name",
+    ("spec", "imagePullSecrets"): "name",
+    ("spec", "hostAliases"): "ip",
+}
+
+
+def _directive_of(value):
+    return value.get(_directive) if isinstance(value, dict) else None
+
+
+def _strip(value):
+    # Remove any directives from a value which is being added rather than
+    # merged, so they aren't passed on to the API server. Anything marked
+    # to be deleted has nothing to be deleted from, so is dropped.
+
+    if isinstance(value, dict):
+        return {
+            k: _strip(v)
+            for k, v in value.items()
+            if k != _directive and _directive_of(v) != "delete"
+        }
+
+    if isinstance(value, list):
+        return [
+            _strip(item)
+            for item in value
+            if _directive_of(item) not in ("delete", "replace")
+        ]
+
+    return value
+
+
+def _merge_dict(target, patch, path, merge_keys):
+    if patch.get(_directive) == "replace":
+        return _strip(patch)
+
+    result = dict(target)
+
+    for key, value in patch.items():
+        if key == _directive:
+            continue
+
+        if _directive_of(value) == "delete":
+            result.pop(key, None)
+        elif key in result:
+            result[key] = merge(result[key], value, path + (key,), merge_keys)
+        else:
+            result[key] = _strip(value)
+
+    return result
+
+
+def _merge_list(target, patch, path, merge_keys):
+    # A "$patch: replace" item anywhere in the patch replaces the list with
+    # the other items of the patch. Lists of values other than dicts, such
+    # as the command or arguments of a container, have no merge key and
+    # are always replaced, as Kubernetes does for the same fields.
+
+    if any(_directive_of(item) == "replace" for item in patch):
+        return _strip(patch)
+
+    if not all(isinstance(item, dict) for item in patch + target):
+        return _strip(patch)
+
+    merge_key = merge_keys.get(path, "name")
+
+    # Index the items of the list by their merge key, so each item of the
+    # patch can be matched without a scan of the list.
+
+    result = list(target)
+
+    index = {}
+
+    for position, item in enumerate(result):
+        if isinstance(item, dict) and merge_key in item:
+            index.setdefault(item[merge_key], position)
+
+    deleted = set()
+
+    for item in patch:
+        if not isinstance(item, dict) or merge_key not in item:
+            result.append(_strip(item))
+            continue
+
+        position = index.get(item[merge_key])
+
+        if _directive_of(item) == "delete":
+            if position is not None:
+                deleted.add(position)
+                del index[item[merge_key]]
+            continue
+
+        if position is None:
+            index[item[merge_key]] = len(result)
+            result.append(_strip(item))
+        else:
+            result[position] = merge(result[position], item, path, merge_keys)
+
+    if deleted:
+        result = [
+            item for position, item in enumerate(result) if position not in deleted
+        ]
+
+    return result
+
+
+def merge(target, patch, path=(), merge_keys=pod_template_merge_keys):
+    # Merge a patch into an object in the manner of a strategic merge
+    # patch, returning the result. Items of lists of dicts are matched
+    # using the merge key for the path to the list, else by name, with
+    # items which don't match being added. Lists of anything else are
+    # replaced. The "$patch" directive can be used to delete or replace a
+    # dict or list item, or replace a whole list. Neither the object nor
+    # the patch is modified, and anything in the object not changed by the
+    # patch is shared with the result.
+
+    if isinstance(patch, dict) and isinstance(target, dict):
+        return _merge_dict(target, patch, path, merge_keys)
+
+    if isinstance(patch, list) and isinstance(target, list):
+        return _merge_list(target, patch, path, merge_keys)
+
+    return _strip(patch)
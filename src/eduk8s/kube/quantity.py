@@ -0,0 +1,73 @@
+import re
+
+from decimal import Decimal
+
+_suffixes = {
+    "n": Decimal("1e-9"),
+    "u": Decimal("1e-6"),
+    "m": Decimal("1e-3"),
+    "": Decimal(1),
+    "k": Decimal("1e3"),
+    "M": Decimal("1e6"),
+    "G": Decimal("1e9"),
+    "T": Decimal("1e12"),
+    "P": Decimal("1e15"),
+    "E": Decimal("1e18"),
+    "Ki": Decimal(2 ** 10),
+    "Mi": Decimal(2 ** 20),
+    "Gi": Decimal(2 ** 30),
+    "Ti": Decimal(2 ** 40),
+    "Pi": Decimal(2 ** 50),
+    "Ei": Decimal(2 ** 60),
+}
+
+_quantity = re.compile(r"^([+-]?[0-9.]+(?:[eE][+-]?[0-9]+)?)([a-zA-Z]*)$")
+
+
+def parse_quantity(value):
+    # Convert a Kubernetes resource quantity such as "250m" or "1Gi" to
+    # a decimal number of the base unit.
+
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(value)
+
+    match = _quantity.match(str(value).strip())
+
+    if not match or match.group(2) not in _suffixes:
+        raise ValueError(f"Invalid quantity '{value}'.")
+
+    return Decimal(match.group(1)) * _suffixes[match.group(2)]
+
+
+def scale_quantity(value, factor):
+    # Multiply a quantity by a whole number, keeping the same suffix.
+
+    match = _quantity.match(str(value).strip())
+
+    if not match or match.group(2) not in _suffixes:
+        raise ValueError(f"Invalid quantity '{value}'.")
+
+    number = Decimal(match.group(1)) * factor
+
+    return f"{number.normalize():f}{match.group(2)}"
+
+
+def format_quantity(value, name=""):
+    # Format a decimal number of the base unit for display, choosing a
+    # suffix based on the type of resource it is a quantity of.
+
+    value = Decimal(value)
+
+    if name.endswith("cpu"):
+        if value and abs(value) < 1:
+            return f"{(value * 1000).quantize(Decimal(1))}m"
+        return f"{value.quantize(Decimal('0.001')).normalize():f}"
+
+    if name.endswith("memory") or name.endswith("storage"):
+        for suffix in ("Ei", "Pi", "Ti", "Gi", "Mi", "Ki"):
+            if abs(value) >= _suffixes[suffix]:
+                scaled = (value / _suffixes[suffix]).quantize(Decimal("0.1"))
+                return f"{scaled.normalize():f}{suffix}"
+        return f"{value.quantize(Decimal(1))}"
+
+    return f"{value.normalize():f}"
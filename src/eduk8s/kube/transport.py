@@ -0,0 +1,233 @@
+import os
+import time
+import random
+import logging
+import threading
+import email.utils
+
+from kubernetes.client.api_client import ApiClient
+from kubernetes.client.rest import ApiException
+
+from urllib3.exceptions import HTTPError
+
+from .. import metrics
+
+logger = logging.getLogger("eduk8s.kube")
+
+# Requests which are safe to repeat no matter what happened to the first
+# attempt. Other requests are only retried when the API server says it
+# rejected them without acting on them.
+
+_idempotent_methods = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+_retryable_statuses = (429, 500, 502, 503, 504)
+
+_rejected_statuses = (429, 503)
+
+
+class TokenBucket:
+    # Limits the rate of requests to an average number per second, while
+    # allowing short bursts up to the size of the bucket. A rate of zero
+    # disables the limit.
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        if self.rate <= 0:
+            return 0.0
+
+        # Take a token now, letting the count go negative when the bucket
+        # is empty, and return how long until the token would have been
+        # available. This keeps requests from many threads in order.
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def acquire(self):
+        delay = self.reserve()
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return delay
+
+
+class Counters:
+    # Running totals of requests made through a client, so that callers
+    # can report how hard the API server was pushed and pushed back. The
+    # failures are requests which were still failing after all retries.
+    # Bytes received and decoded are only counted for response bodies
+    # read by the list functions and the async client, which is where
+    # the bulk of data is.
+
+    fields = (
+        "requests",
+        "retries",
+        "throttled",
+        "failures",
+        "waited",
+        "received",
+        "decoded",
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = dict.fromkeys(self.fields, 0)
+
+    def add(self, field, value=1):
+        with self.lock:
+            self.values[field] += value
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.values)
+
+
+def _retry_after(headers):
+    # The API server gives the number of seconds to wait, but an HTTP date
+    # is also valid for the header.
+
+    value = headers and headers.get("Retry-After")
+
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        return max(
+            email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+def settings(qps=None, burst=None, retries=None):
+    # The limit on the rate of requests and the number of retries, where
+    # not given, come from the environment.
+
+    if qps is None:
+        qps = float(os.environ.get("EDUK8S_QPS", "50"))
+    if burst is None:
+        burst = int(os.environ.get("EDUK8S_BURST", "100"))
+    if retries is None:
+        retries = int(os.environ.get("EDUK8S_RETRIES", "6"))
+
+    return qps, burst, retries
+
+
+def verb(method, query_params=None):
+    # The verb for a request as the API server would see it, which makes
+    # the distinction between watching and otherwise getting objects.
+
+    for name, value in query_params or []:
+        if name == "watch" and value:
+            return "WATCH"
+
+    return method
+
+
+def retryable(method, error):
+    if isinstance(error, ApiException):
+        if error.status in _rejected_statuses:
+            return True
+        return method in _idempotent_methods and error.status in _retryable_statuses
+
+    # Connection failures and timeouts, where it is not known whether
+    # the request reached the API server.
+
+    return method in _idempotent_methods
+
+
+def retry_delay(attempt, error, backoff=0.5, max_backoff=30.0):
+    # Back off exponentially with jitter, but for no less time than the
+    # API server asked to be left alone for.
+
+    delay = min(max_backoff, backoff * 2 ** attempt)
+    delay = random.uniform(delay / 2, delay)
+
+    if isinstance(error, ApiException):
+        delay = max(delay, _retry_after(error.headers) or 0.0)
+
+    return delay
+
+
+class RetryingApiClient(ApiClient):
+    # API client which limits the rate of requests made to the API server
+    # and retries requests which failed for reasons which are likely to
+    # be temporary, backing off exponentially with jitter between tries.
+
+    def __init__(self, configuration=None, qps=None, burst=None, retries=None):
+        super().__init__(configuration=configuration)
+
+        qps, burst, retries = settings(qps, burst, retries)
+
+        self.limiter = TokenBucket(qps, burst)
+        self.retries = retries
+        self.backoff = 0.5
+        self.max_backoff = 30.0
+        self.counters = Counters()
+
+    def request(self, method, url, *args, **kwargs):
+        attempt = 0
+
+        while True:
+            self.counters.add("waited", self.limiter.acquire())
+            self.counters.add("requests")
+
+            # The time taken is recorded as soon as the attempt is done, so
+            # it doesn't include any time spent waiting to retry.
+
+            started = time.monotonic()
+
+            try:
+                try:
+                    return super().request(method, url, *args, **kwargs)
+                finally:
+                    metrics.observe(
+                        "eduk8s_api_request_duration_seconds",
+                        time.monotonic() - started,
+                        {"verb": verb(method, kwargs.get("query_params"))},
+                    )
+
+            except (ApiException, HTTPError) as error:
+                if isinstance(error, ApiException) and error.status == 429:
+                    self.counters.add("throttled")
+
+                if not retryable(method, error):
+                    raise
+
+                if attempt >= self.retries:
+                    self.counters.add("failures")
+                    raise
+
+                delay = retry_delay(attempt, error, self.backoff, self.max_backoff)
+
+                attempt += 1
+
+                logger.debug(
+                    "Retrying %s %s in %.2f seconds after %s.",
+                    method,
+                    url,
+                    delay,
+                    getattr(error, "status", None) or type(error).__name__,
+                )
+
+                self.counters.add("retries")
+                self.counters.add("waited", delay)
+
+                time.sleep(delay)
@@ -0,0 +1,182 @@
+import os
+import threading
+
+# Metrics recorded while a command runs, which can be written out as an
+# OpenMetrics text file when it is done, for collection by the textfile
+# collector of the node exporter. A file holds the metrics of the one
+# command which last wrote it, so values which would otherwise be counters
+# are written as gauges of what happened during that command.
+
+duration_buckets = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+    600.0,
+)
+
+count_buckets = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_families = {
+    "eduk8s_command_duration_seconds": (
+        "histogram",
+        "Time taken to run the command.",
+        duration_buckets,
+    ),
+    "eduk8s_command_timestamp_seconds": (
+        "gauge",
+        "Time at which the command finished.",
+        None,
+    ),
+    "eduk8s_api_request_duration_seconds": (
+        "histogram",
+        "Time taken by each attempt at a request to the API server.",
+        duration_buckets,
+    ),
+    "eduk8s_api_requests": ("gauge", "Requests made to the API server.", None),
+    "eduk8s_api_retries": ("gauge", "Requests to the API server retried.", None),
+    "eduk8s_api_throttled": (
+        "gauge",
+        "Requests rejected by the API server as too many.",
+        None,
+    ),
+    "eduk8s_api_failures": (
+        "gauge",
+        "Requests to the API server still failing after all retries.",
+        None,
+    ),
+    "eduk8s_session_name_collisions": (
+        "gauge",
+        "Session names generated which were already in use.",
+        None,
+    ),
+    "eduk8s_session_objects_created": (
+        "histogram",
+        "Objects created for each session.",
+        count_buckets,
+    ),
+}
+
+_lock = threading.Lock()
+
+_values = {}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+
+def _key(name, labels):
+    return (name, tuple(sorted((labels or {}).items())))
+
+
+def inc(name, labels=None, value=1):
+    with _lock:
+        key = _key(name, labels)
+        _values[key] = _values.get(key, 0) + value
+
+
+def set_value(name, value, labels=None):
+    with _lock:
+        _values[_key(name, labels)] = value
+
+
+def observe(name, value, labels=None):
+    with _lock:
+        key = _key(name, labels)
+        if key not in _values:
+            _values[key] = Histogram(_families[name][2])
+        _values[key].observe(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _sample(name, labels, value):
+    if labels:
+        labels = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+        return f"{name}{{{labels}}} {value}"
+    return f"{name} {value}"
+
+
+def render():
+    with _lock:
+        values = {
+            key: (
+                (list(value.counts), value.count, value.sum)
+                if isinstance(value, Histogram)
+                else value
+            )
+            for key, value in _values.items()
+        }
+
+    lines = []
+
+    for family, (metric_type, description, buckets) in _families.items():
+        samples = sorted(
+            (labels, value)
+            for (name, labels), value in values.items()
+            if name == family
+        )
+
+        if not samples:
+            continue
+
+        lines.append(f"# TYPE {family} {metric_type}")
+        lines.append(f"# HELP {family} {description}")
+
+        for labels, value in samples:
+            if metric_type == "histogram":
+                counts, count, total = value
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(
+                        _sample(
+                            f"{family}_bucket", labels + (("le", bound),), bucket_count
+                        )
+                    )
+                lines.append(
+                    _sample(f"{family}_bucket", labels + (("le", "+Inf"),), count)
+                )
+                lines.append(_sample(f"{family}_count", labels, count))
+                lines.append(_sample(f"{family}_sum", labels, round(total, 6)))
+            else:
+                lines.append(_sample(family, labels, value))
+
+    lines.append("# EOF")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(filename):
+    # Write to a temporary file first and then rename it, so the collector
+    # never reads a partly written file.
+
+    temporary = f"{filename}.{os.getpid()}.tmp"
+
+    with open(temporary, "w") as fp:
+        fp.write(render())
+
+    os.replace(temporary, filename)
@@ -0,0 +1,222 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+import collections
+
+
+class StackSampler:
+    # Samples the stacks of all threads at a regular interval, counting
+    # how often each stack is seen. Unlike cProfile, this covers work
+    # done on the threads used to run requests concurrently. The counts
+    # are written as collapsed stacks, the input format for flame graphs.
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.counts = collections.Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _label(frame):
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        ident = threading.get_ident()
+
+        while not self.stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == ident:
+                    continue
+
+                stack = []
+
+                while frame is not None:
+                    stack.append(self._label(frame))
+                    frame = frame.f_back
+
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def write(self, filename):
+        with open(filename, "w") as fp:
+            for stack, count in self.counts.most_common():
+                fp.write(f"{stack} {count}\n")
+
+
+class ThreadProfiler:
+    # Runs cProfile in the main thread and in each thread started while
+    # profiling, as a profiler only sees calls made in the thread it was
+    # enabled in. The stats of all the profilers are merged when done.
+    # Where a single profiler already sees calls made in all threads, as
+    # from Python 3.12, a second profiler can't be enabled and the main
+    # one is relied on instead.
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.profilers = []
+        self.lock = threading.Lock()
+
+    def _start_thread(self, frame, event, arg):
+        # Installed as the profile function of each new thread, so only
+        # called for the first event in the thread, as enabling the
+        # profiler for the thread replaces it.
+
+        profiler = cProfile.Profile()
+
+        try:
+            profiler.enable()
+        except ValueError:
+            sys.setprofile(None)
+            return
+
+        with self.lock:
+            self.profilers.append(profiler)
+
+    def start(self):
+        threading.setprofile(self._start_thread)
+        self.profiler.enable()
+
+    def stop(self):
+        # The main profiler is disabled first, as collecting the stats of
+        # a profiler disables profiling in the thread collecting them.
+
+        self.profiler.disable()
+        threading.setprofile(None)
+
+        stats = pstats.Stats(self.profiler)
+
+        with self.lock:
+            profilers, self.profilers = self.profilers, []
+
+        for profiler in profilers:
+            stats.add(profiler)
+
+        return stats
+
+
+def profile_cpu(filename):
+    # Start profiling CPU use, returning a function to stop profiling and
+    # write out the results. A file name ending in ".folded" or ".collapsed"
+    # gets collapsed stacks from sampling all threads, otherwise the
+    # merged pstats output of cProfile for all threads is written.
+
+    if filename.endswith((".folded", ".collapsed")):
+        sampler = StackSampler()
+        sampler.start()
+
+        def _stop():
+            sampler.stop()
+            sampler.write(filename)
+
+    else:
+        profiler = ThreadProfiler()
+        profiler.start()
+
+        def _stop():
+            profiler.stop().dump_stats(filename)
+
+    return _stop
+
+
+class PeakSnapshot:
+    # Keeps a snapshot of traced memory allocations taken close to when
+    # memory use peaked, rather than whatever is left allocated at the
+    # end. Taking a snapshot is costly, so memory use is sampled and a
+    # snapshot only taken when the peak has at least doubled since the
+    # last one, and no more than a set number of snapshots are taken.
+    # The snapshot is thus of allocations when memory use was at least
+    # half the peak. The peak itself is as reported by tracemalloc.
+
+    def __init__(self, interval=0.05, minimum=2 ** 20, limit=8):
+        self.interval = interval
+        self.minimum = minimum
+        self.limit = limit
+        self.taken = 0
+        self.snapshot = None
+        self.peak = 0
+        self.size = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _take(self):
+        current, peak = tracemalloc.get_traced_memory()
+
+        self.snapshot = tracemalloc.take_snapshot()
+        self.taken += 1
+        self.peak = peak
+        self.size = current
+
+    def _run(self):
+        while self.taken < self.limit and not self.stopped.wait(self.interval):
+            peak = tracemalloc.get_traced_memory()[1]
+
+            if peak >= max(self.minimum, self.peak * 2):
+                self._take()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+        if self.snapshot is None:
+            self._take()
+
+        return self.snapshot
+
+
+def profile_memory(limit=10):
+    # Start tracing memory allocations, returning a function to stop and
+    # return a report of the peak memory and where the most memory was
+    # allocated from at about the time of the peak.
+
+    started = time.monotonic()
+
+    tracemalloc.start()
+
+    sampler = PeakSnapshot()
+    sampler.start()
+
+    def _stop():
+        snapshot = sampler.stop()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        snapshot = snapshot.filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            )
+        )
+
+        lines = [
+            f"Memory: peak {peak / 2 ** 20:.1f} MiB, "
+            f"current {current / 2 ** 20:.1f} MiB, "
+            f"over {time.monotonic() - started:.1f}s, "
+            f"allocations as at {sampler.size / 2 ** 20:.1f} MiB"
+        ]
+
+        for statistic in snapshot.statistics("lineno")[:limit]:
+            frame = statistic.traceback[0]
+            lines.append(
+                f"  {statistic.size / 2 ** 10:10.1f} KiB {statistic.count:8} blocks  "
+                f"{frame.filename}:{frame.lineno}"
+            )
+
+        return lines
+
+    return _stop
@@ -0,0 +1,91 @@
+from kubernetes.client.rest import ApiException
+
+from . import kube
+
+
+def service_account_subject(name, namespace):
+    return {"kind": "ServiceAccount", "name": f"{name}", "namespace": f"{namespace}"}
+
+
+def session_subject(workshop_namespace, user_id):
+    # The service account the workshop dashboard for a session runs as.
+
+    return service_account_subject(f"user-{user_id}", workshop_namespace)
+
+
+def _subject_key(subject):
+    return (subject.get("kind"), subject.get("namespace"), subject.get("name"))
+
+
+def update_subjects(resource, name, add=(), remove=(), namespace=None, attempts=10):
+    # Add subjects to and remove subjects from a role binding, or cluster
+    # role binding, shared by sessions. The binding is read, changed and
+    # replaced, with the replace failing if the binding was changed by
+    # anything else in the meantime, in which case it is tried again.
+    # This way sessions created or deleted at the same time don't lose
+    # each others changes. Returns whether the binding was changed.
+
+    add_keys = [_subject_key(subject) for subject in add]
+    remove_keys = set(_subject_key(subject) for subject in remove)
+
+    for attempt in range(attempts):
+        binding = kube.get_object(resource, name, namespace=namespace)
+
+        subjects = binding.get("subjects") or []
+
+        updated = [
+            subject for subject in subjects if _subject_key(subject) not in remove_keys
+        ]
+
+        keys = set(_subject_key(subject) for subject in updated)
+
+        for key, subject in zip(add_keys, add):
+            if key not in keys:
+                updated.append(subject)
+                keys.add(key)
+
+        if updated == subjects:
+            return False
+
+        binding["subjects"] = updated
+
+        try:
+            resource.replace(body=binding, namespace=namespace)
+        except ApiException as e:
+            if e.status != 409 or attempt + 1 >= attempts:
+                raise
+        else:
+            return True
+
+
+def console_binding_body(workshop_name, workshop_uid, workshop_namespace, subjects=()):
+    # When console access is granted per workshop, the one cluster role
+    # binding lists the service account of each session as a subject,
+    # rather than there being a binding for every session. Only these
+    # service accounts are bound, not others in the workshop namespace
+    # such as the default service account or that of the router.
+
+    return {
+        "apiVersion": "rbac.authorization.k8s.io/v1",
+        "kind": "ClusterRoleBinding",
+        "metadata": {
+            "name": f"{workshop_namespace}-console",
+            "labels": {"training.eduk8s.io/workshop": f"{workshop_name}"},
+            "ownerReferences": [
+                {
+                    "apiVersion": "training.eduk8s.io/v1alpha1",
+                    "kind": "Workshop",
+                    "blockOwnerDeletion": True,
+                    "controller": True,
+                    "name": f"{workshop_name}",
+                    "uid": f"{workshop_uid}",
+                }
+            ],
+        },
+        "roleRef": {
+            "apiGroup": "rbac.authorization.k8s.io",
+            "kind": "ClusterRole",
+            "name": f"{workshop_namespace}-console",
+        },
+        "subjects": list(subjects),
+    }
@@ -0,0 +1,447 @@
+import asyncio
+import logging
+import threading
+import time
+
+from . import kube
+
+logger = logging.getLogger("eduk8s.router")
+
+
+class RoutingTable:
+    # Maps the hostname for each session of a workshop to the service
+    # for its workshop dashboard. The table is indexed by hostname and
+    # kept up to date from a watch on the sessions for the workshop. The
+    # hostnames which requests have been routed for are also tracked, so
+    # when each session was last used can be recorded against it.
+
+    def __init__(self, workshop, domain):
+        self.workshop = workshop
+        self.domain = domain
+        self.routes = {}
+        self.accessed = set()
+        self.lock = threading.Lock()
+
+    def hostname(self, session_name):
+        return f"{session_name}.{self.domain}"
+
+    def target(self, session):
+        metadata = session["metadata"]
+        user_id = metadata["name"][len(self.workshop) + 1 :]
+        return (f"workshop-{user_id}.{self.workshop}.svc", 10080)
+
+    def lookup(self, hostname):
+        hostname = hostname.lower()
+        with self.lock:
+            target = self.routes.get(hostname)
+            if target:
+                self.accessed.add(hostname)
+            return target
+
+    def replace(self, sessions):
+        routes = {
+            self.hostname(session["metadata"]["name"]): self.target(session)
+            for session in sessions
+        }
+        with self.lock:
+            self.routes = routes
+
+    def update(self, event_type, session):
+        hostname = self.hostname(session["metadata"]["name"])
+        with self.lock:
+            if event_type == "DELETED":
+                self.routes.pop(hostname, None)
+            else:
+                self.routes[hostname] = self.target(session)
+
+    def relist(self, session_resource, label_selector, limit=500):
+        # List the sessions in pages, so a workshop with many sessions isn't
+        # returned by the API server all at once, then replace the table.
+        # All pages are of the one list, so the resource version of the
+        # last page is that to watch from.
+
+        sessions = []
+        token = None
+
+        while True:
+            page = kube.get_object(
+                session_resource,
+                label_selector=label_selector,
+                limit=limit,
+                _continue=token,
+            )
+
+            sessions.extend(page.get("items") or [])
+
+            token = page["metadata"].get("continue")
+
+            if not token:
+                break
+
+        self.replace(sessions)
+
+        return page["metadata"]["resourceVersion"]
+
+    def watch(self, client):
+        session_resource = client.resources.get(
+            api_version="training.eduk8s.io/v1alpha1", kind="Session"
+        )
+
+        label_selector = f"workshop={self.workshop}"
+
+        # Each time around, rebuild the table from a full list so any
+        # events missed while the watch was down are accounted for, then
+        # watch for changes from that point on.
+
+        while True:
+            try:
+                resource_version = self.relist(session_resource, label_selector)
+
+                for event in session_resource.watch(
+                    label_selector=label_selector,
+                    resource_version=resource_version,
+                    timeout=300,
+                ):
+                    if event["type"] in ("ADDED", "MODIFIED", "DELETED"):
+                        self.update(event["type"], event["raw_object"])
+
+            except Exception:
+                logger.exception("Failed watching sessions, retrying.")
+                time.sleep(5)
+
+    def report(self, client, interval=60):
+        # Record the time of the last request for each session in the
+        # annotation the idle policy for suspending sessions goes by. To
+        # limit the writes made, this is done once each interval for the
+        # sessions which had requests during that interval.
+
+        session_resource = client.resources.get(
+            api_version="training.eduk8s.io/v1alpha1", kind="Session"
+        )
+
+        while True:
+            time.sleep(interval)
+
+            with self.lock:
+                accessed, self.accessed = self.accessed, set()
+
+            timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+            session_body = {
+                "metadata": {
+                    "annotations": {"training.eduk8s.io/last-activity": timestamp}
+                }
+            }
+
+            for hostname in accessed:
+                name = hostname[: -len(self.domain) - 1]
+
+                try:
+                    session_resource.patch(
+                        name=name,
+                        body=session_body,
+                        content_type="application/merge-patch+json",
+                    )
+                except Exception:
+                    logger.exception(f"Failed recording activity for {name}.")
+
+
+_not_found_response = (
+    b"HTTP/1.1 404 Not Found\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"Content-Length: 18\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+    b"Session not found\n"
+)
+
+_bad_gateway_response = (
+    b"HTTP/1.1 502 Bad Gateway\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"Content-Length: 24\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+    b"Session not available.\r\n"
+)
+
+
+def _parse_head(head):
+    # Split a request or response head into its start line and a dict of
+    # the headers, with the names lower cased. Repeated headers are joined
+    # with commas, as for a list of values.
+
+    lines = head[:-4].decode("latin-1").split("\r\n")
+
+    headers = {}
+
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        name = name.strip().lower()
+        value = value.strip()
+        if name in headers:
+            headers[name] = f"{headers[name]}, {value}"
+        else:
+            headers[name] = value
+
+    return lines[0], headers
+
+
+def _tokens(headers, name):
+    return [token.strip().lower() for token in headers.get(name, "").split(",")]
+
+
+def _keep_alive(start_line, headers):
+    # Whether the connection stays open after a request or response. Only
+    # HTTP/1.1 connections are reused, unless either side says otherwise.
+
+    if start_line.startswith("HTTP/"):
+        version = start_line.split(" ", 1)[0]
+    else:
+        version = start_line.rsplit(" ", 1)[-1]
+
+    return version.upper() == "HTTP/1.1" and "close" not in _tokens(
+        headers, "connection"
+    )
+
+
+def _body_length(headers):
+    # How the length of a message body is given. Returns "chunked" for a
+    # chunked body, the number of bytes where there is a content length,
+    # or None where neither is given.
+
+    if _tokens(headers, "transfer-encoding")[-1] == "chunked":
+        return "chunked"
+
+    if "content-length" in headers:
+        return int(headers["content-length"])
+
+
+async def _copy(reader, writer, length):
+    while length > 0:
+        data = await reader.read(min(length, 65536))
+        if not data:
+            raise asyncio.IncompleteReadError(b"", length)
+        writer.write(data)
+        length -= len(data)
+        await writer.drain()
+
+
+async def _copy_chunked(reader, writer):
+    # Pass through a chunked body chunk by chunk, including any trailers,
+    # stopping at the end of the body so the connection can be reused.
+
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        writer.write(line)
+
+        size = int(line.split(b";", 1)[0].strip(), 16)
+
+        if size == 0:
+            while True:
+                line = await reader.readuntil(b"\r\n")
+                writer.write(line)
+                if line == b"\r\n":
+                    break
+            await writer.drain()
+            return
+
+        await _copy(reader, writer, size + 2)
+
+
+async def _copy_body(reader, writer, length):
+    if length == "chunked":
+        await _copy_chunked(reader, writer)
+    elif length:
+        await _copy(reader, writer, length)
+
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+    except ConnectionError:
+        writer.close()
+
+
+class ConnectionPool:
+    # Holds connections to the workshop dashboard of each session which
+    # are idle after a response, so later requests for the same session,
+    # from any client, can be sent without opening a new connection.
+
+    def __init__(self, size=8):
+        self.size = size
+        self.idle = {}
+
+    async def acquire(self, target):
+        connections = self.idle.get(target) or []
+
+        while connections:
+            reader, writer = connections.pop()
+
+            # A connection which the session closed while idle will have
+            # seen the end of the stream, so isn't used again.
+
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+
+            writer.close()
+
+        return await asyncio.open_connection(*target)
+
+    def release(self, target, connection):
+        connections = self.idle.setdefault(target, [])
+
+        if len(connections) < self.size:
+            connections.append(connection)
+        else:
+            connection[1].close()
+
+
+async def _respond(client_writer, response):
+    client_writer.write(response)
+    await client_writer.drain()
+    client_writer.close()
+
+
+async def _handle(table, pool, client_reader, client_writer):
+    # Read each request on a connection from a client in turn, and pass it
+    # through to the session for the host given for that request. Requests
+    # and responses are passed through knowing where their bodies end, so
+    # both the connection from the client and that to the session can be
+    # used for further requests. Once upgraded to a websocket, the data is
+    # instead passed through in both directions until either side closes.
+
+    try:
+        while await _handle_request(table, pool, client_reader, client_writer):
+            pass
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, OSError):
+        pass
+    finally:
+        client_writer.close()
+
+
+async def _handle_request(table, pool, client_reader, client_writer):
+    # Pass through a single request and its response, returning whether
+    # the connection from the client can be used for another request.
+
+    try:
+        head = await client_reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return False
+
+    request_line, request_headers = _parse_head(head)
+
+    host = request_headers.get("host", "").rsplit(":", 1)[0]
+    target = host and table.lookup(host)
+
+    if not target:
+        await _respond(client_writer, _not_found_response)
+        return False
+
+    try:
+        upstream_reader, upstream_writer = await pool.acquire(target)
+    except OSError:
+        await _respond(client_writer, _bad_gateway_response)
+        return False
+
+    reusable = False
+
+    try:
+        upstream_writer.write(head)
+
+        # The request body is sent while waiting for the response, as a
+        # client expecting a continue response only sends the body once
+        # the continue response is passed back.
+
+        request = asyncio.ensure_future(
+            _copy_body(client_reader, upstream_writer, _body_length(request_headers))
+        )
+
+        try:
+            while True:
+                try:
+                    response = await upstream_reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    await _respond(client_writer, _bad_gateway_response)
+                    return False
+
+                status_line, response_headers = _parse_head(response)
+
+                status = status_line.split(" ", 2)[1:2]
+                status = int(status[0]) if status else 0
+
+                client_writer.write(response)
+
+                if status == 101 or not 100 <= status < 200:
+                    break
+
+            if status == 101:
+                await client_writer.drain()
+                await asyncio.gather(
+                    _pipe(client_reader, upstream_writer),
+                    _pipe(upstream_reader, client_writer),
+                )
+                return False
+
+            # Responses to a HEAD request, and those with no content, have
+            # no body whatever the headers say. Otherwise where the length
+            # of the body isn't given, it ends when the session closes the
+            # connection, so the connection to the client is closed too.
+
+            if request_line.upper().startswith("HEAD ") or status in (204, 304):
+                length = 0
+            else:
+                length = _body_length(response_headers)
+
+            if length is None:
+                await _pipe(upstream_reader, client_writer)
+                return False
+
+            await _copy_body(upstream_reader, client_writer, length)
+
+            await request
+
+        finally:
+            request.cancel()
+
+        reusable = _keep_alive(request_line, request_headers) and _keep_alive(
+            status_line, response_headers
+        )
+
+        return reusable
+
+    finally:
+        if reusable:
+            pool.release(target, (upstream_reader, upstream_writer))
+        else:
+            upstream_writer.close()
+
+
+def serve(client, workshop, domain, port):
+    table = RoutingTable(workshop, domain)
+
+    watcher = threading.Thread(target=table.watch, args=(client,), daemon=True)
+    watcher.start()
+
+    reporter = threading.Thread(target=table.report, args=(client,), daemon=True)
+    reporter.start()
+
+    async def _serve():
+        pool = ConnectionPool()
+
+        server = await asyncio.start_server(
+            lambda reader, writer: _handle(table, pool, reader, writer),
+            port=port,
+            limit=65536,
+        )
+
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(_serve())
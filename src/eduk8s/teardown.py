@@ -0,0 +1,157 @@
+import time
+
+from kubernetes.client.rest import ApiException
+from openshift.dynamic.exceptions import ResourceNotFoundError
+
+from .kube import aio
+
+# Cluster scoped types of objects which are created for workshops and
+# sessions. Being cluster scoped, they aren't cleaned up by deleting the
+# namespace for the workshop or session, only by garbage collection.
+
+cluster_scoped_types = (
+    ("v1", "Namespace"),
+    ("rbac.authorization.k8s.io/v1", "ClusterRole"),
+    ("rbac.authorization.k8s.io/v1", "ClusterRoleBinding"),
+)
+
+
+def object_types(client, definitions):
+    # Return the cluster scoped types of the object definitions, so they
+    # can be included when looking for objects owned by a workshop.
+
+    types = []
+
+    for definition in definitions or []:
+        api_version = definition.get("apiVersion")
+        kind = definition.get("kind")
+
+        try:
+            resource = client.resources.get(api_version=api_version, kind=kind)
+        except Exception:
+            continue
+
+        if not resource.namespaced:
+            types.append((api_version, kind))
+
+    return types
+
+
+def owned_objects(client, uids, label_selector, types=cluster_scoped_types):
+    # Find the cluster scoped objects with an owner reference to any of
+    # the given owners. Everything created for a workshop or session is
+    # labelled with its name, so only objects matching the label selector
+    # are listed, with the owner references checked in case the labels
+    # were copied to anything else. Each type of object is listed
+    # concurrently, and only the metadata of the objects is fetched.
+
+    uids = set(uids)
+
+    async def _list(api, resource_type):
+        api_version, kind = resource_type
+        resource = await api.resource(api_version, kind)
+        matches = []
+        async for metadata in api.list_metadata(
+            resource, label_selector=label_selector
+        ):
+            for reference in metadata.get("ownerReferences") or []:
+                if reference.get("uid") in uids:
+                    matches.append((resource, None, metadata["name"]))
+                    break
+        return matches
+
+    async def _list_all(api):
+        return await aio.fan_out(
+            lambda resource_type: _list(api, resource_type), dict.fromkeys(types)
+        )
+
+    objects = []
+
+    for resource_type, matches, error in aio.run(client, _list_all):
+        if error is not None:
+            if isinstance(error, ApiException) and error.status in (403, 404):
+                continue
+            if isinstance(error, ResourceNotFoundError):
+                continue
+            raise error
+        objects.extend(matches)
+
+    return objects
+
+
+def delete_objects(client, objects, propagation_policy="Background"):
+    # Delete the objects all at the same time, ignoring any which are
+    # already gone. Objects in a namespace which is itself being deleted
+    # will go with the namespace, so aren't deleted separately. Returns
+    # the objects which could not be deleted and the errors.
+
+    async def _delete(api, item):
+        resource, namespace, name = item
+
+        try:
+            await api.delete(
+                resource,
+                name,
+                namespace=namespace,
+                propagation_policy=propagation_policy,
+            )
+        except ApiException as e:
+            if e.status != 404:
+                raise
+
+    namespaces = set(
+        name for resource, _, name in objects if resource.kind == "Namespace"
+    )
+
+    objects = [item for item in objects if item[1] not in namespaces]
+
+    async def _delete_all(api):
+        return await aio.fan_out(lambda item: _delete(api, item), reversed(objects))
+
+    return [
+        (item, error)
+        for item, _, error in aio.run(client, _delete_all)
+        if error is not None
+    ]
+
+
+def wait_for_deletion(client, objects, timeout):
+    # Wait for the objects to be gone, watching each one concurrently.
+    # Returns the objects still present when the timeout expired.
+
+    deadline = time.monotonic() + timeout
+
+    async def _wait(api, item):
+        resource, namespace, name = item
+
+        while True:
+            try:
+                metadata = await api.get_metadata(resource, name, namespace=namespace)
+            except ApiException as e:
+                if e.status == 404:
+                    return True
+                raise
+
+            remaining = deadline - time.monotonic()
+
+            if remaining <= 0:
+                return False
+
+            async for event in api.watch(
+                resource,
+                namespace=namespace,
+                field_selector=f"metadata.name={name}",
+                resource_version=metadata.get("resourceVersion"),
+                timeout=max(1, min(int(remaining), 60)),
+            ):
+                if event["type"] == "DELETED":
+                    return True
+
+    async def _wait_all(api):
+        return await aio.fan_out(lambda item: _wait(api, item), objects)
+
+    return [
+        item
+        for item, gone, error in aio.run(client, _wait_all)
+        if error is not None or not gone
+    ]